@@ -0,0 +1,6 @@
+"""
+Process entry points:
+    python -m app.web   web tier (uvicorn, WEB_WORKERS processes)
+    python -m app.bot   bot polling only
+    python main.py      both in one process (development)
+"""
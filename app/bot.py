@@ -0,0 +1,47 @@
+"""
+Bot tier: python -m app.bot (long polling, BOT_MODE=polling only).
+A single process: Telegram delivers getUpdates to one consumer per token.
+For several replicas use BOT_MODE=webhook, updates then go to app.web.
+"""
+import asyncio
+import logging
+import sys
+
+from app.runtime import create_bot, run_polling
+from bot.dispatcher import create_dispatcher
+from core.config import settings
+from core.database import ensure_db_exists
+from core.db_pool import init_pool, close_pool
+from core.dependencies import notification_service
+from core.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def run():
+    await init_pool()
+    await ensure_db_exists()
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    notification_service.set_bot(bot)
+    logger.info("Bot polling started")
+    try:
+        # aiogram stops polling on SIGINT/SIGTERM, then queued notifications go out
+        await run_polling(bot, dp)
+    finally:
+        await notification_service.stop()
+        await bot.session.close()
+        await close_pool()
+
+
+def main():
+    setup_logging(log_level="INFO", log_file="teremok-bot.log")
+    if settings.BOT_MODE == "webhook":
+        logger.error("BOT_MODE=webhook: updates are handled by python -m app.web, nothing to poll")
+        sys.exit(1)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
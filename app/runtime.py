@@ -0,0 +1,37 @@
+"""
+Pieces shared by the entry points in app/ and main.py.
+"""
+import logging
+
+from aiogram import Bot, Dispatcher
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_bot() -> Bot:
+    if settings.FAKE_TELEGRAM:
+        from bot.fake_telegram import create_fake_bot
+        logger.warning("FAKE_TELEGRAM: Bot API calls are recorded, not sent")
+        return create_fake_bot()
+    return Bot(token=settings.BOT_TOKEN)
+
+
+async def run_polling(bot: Bot, dp: Dispatcher, handle_signals: bool = True) -> None:
+    # A registered webhook makes getUpdates fail
+    await bot.delete_webhook()
+    await dp.start_polling(bot, handle_signals=handle_signals)
+
+
+def uvicorn_options() -> dict:
+    """Server options common to the combined and the standalone web runner"""
+    return {
+        "host": settings.HOST,
+        "port": settings.PORT,
+        "log_level": "info",
+        "loop": settings.WEB_LOOP,
+        "http": settings.WEB_HTTP,
+        # In-flight requests get this long after SIGTERM, then lifespan shutdown drains queues
+        "timeout_graceful_shutdown": settings.WEB_GRACEFUL_TIMEOUT,
+    }
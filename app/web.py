@@ -0,0 +1,61 @@
+"""
+Web tier: python -m app.web
+Runs WEB_WORKERS uvicorn processes (one event loop per core). Migrations
+run once in the parent before workers start; every worker builds its own
+pool, Bot client and background workers in the app lifespan. On SIGTERM
+uvicorn stops accepting, waits up to WEB_GRACEFUL_TIMEOUT for in-flight
+requests, then the lifespan drains the task queue, notifications and the
+Sheets outbox.
+"""
+import asyncio
+import importlib.util
+import logging
+
+import uvicorn
+
+from app.runtime import create_bot, uvicorn_options
+from bot.dispatcher import create_dispatcher
+from core.config import settings
+from core.database import ensure_db_exists
+from core.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _log_file():
+    # Several processes must not rotate one file: console only then
+    return "teremok-web.log" if settings.WEB_WORKERS <= 1 else None
+
+
+def create_app():
+    """ASGI factory, called in every worker process"""
+    setup_logging(log_level="INFO", log_file=_log_file())
+    from web.routes import app, set_bot
+
+    bot = create_bot()
+    set_bot(bot, create_dispatcher() if settings.BOT_MODE == "webhook" else None)
+    app.state.owned_bot = bot
+    return app
+
+
+def _describe_server() -> str:
+    loop = settings.WEB_LOOP
+    if loop == "auto":
+        loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = settings.WEB_HTTP
+    if http == "auto":
+        http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return f"{settings.WEB_WORKERS} worker(s), loop={loop}, http={http}"
+
+
+def main():
+    setup_logging(log_level="INFO", log_file=_log_file())
+    asyncio.run(ensure_db_exists())
+    if settings.BOT_MODE != "webhook":
+        logger.info("BOT_MODE=polling: run python -m app.bot next to the web tier")
+    logger.info(f"Web App on http://{settings.HOST}:{settings.PORT}: {_describe_server()}")
+    uvicorn.run("app.web:create_app", factory=True, workers=settings.WEB_WORKERS, **uvicorn_options())
+
+
+if __name__ == "__main__":
+    main()
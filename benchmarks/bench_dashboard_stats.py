@@ -0,0 +1,62 @@
+"""
+Benchmark: dashboard statistics, 8 sequential queries vs one statement.
+Needs a reachable database (settings from .env).
+
+Usage:
+    python -m benchmarks.bench_dashboard_stats [iterations]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+
+from core.db_pool import init_pool, close_pool, acquire
+from repositories.user_repository import UserRepository
+
+
+async def old_statistics() -> dict:
+    """Previous implementation: one query per counter (7d window in calendar days, as the rollup)"""
+    stats = {}
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    date_7d = today - timedelta(days=6)
+    async with acquire() as conn:
+        stats['total_leads'] = await conn.fetchval("SELECT COUNT(*) FROM user_contacts")
+        stats['total_tests'] = await conn.fetchval("SELECT COUNT(*) FROM test_results")
+        stats['new_leads'] = await conn.fetchval("SELECT COUNT(*) FROM user_contacts WHERE status = 'new'")
+        stats['completed_leads'] = await conn.fetchval("SELECT COUNT(*) FROM user_contacts WHERE status = 'done'")
+        stats['leads_7d'] = await conn.fetchval("SELECT COUNT(*) FROM user_contacts WHERE created_at >= $1", date_7d)
+        stats['tests_7d'] = await conn.fetchval("SELECT COUNT(*) FROM test_results WHERE created_at >= $1", date_7d)
+        stats['leads_today'] = await conn.fetchval("SELECT COUNT(*) FROM user_contacts WHERE created_at >= $1", today)
+        stats['tests_today'] = await conn.fetchval("SELECT COUNT(*) FROM test_results WHERE created_at >= $1", today)
+    return stats
+
+
+async def timeit(label: str, func, iterations: int) -> float:
+    await func()  # warm-up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / iterations
+    print(f"{label:<20} {elapsed_ms:8.2f} ms/call")
+    return elapsed_ms
+
+
+async def main(iterations: int):
+    await init_pool()
+    try:
+        repo = UserRepository()
+        old = await old_statistics()
+        new = await repo.get_statistics()
+        mismatched = [k for k in old if old[k] != new.get(k)]
+        if mismatched:
+            print(f"WARNING: counters differ: {mismatched}")
+
+        old_ms = await timeit("8 queries", old_statistics, iterations)
+        new_ms = await timeit("single statement", repo.get_statistics, iterations)
+        print(f"speedup: x{old_ms / new_ms:.1f}")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
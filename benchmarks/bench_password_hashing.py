@@ -0,0 +1,64 @@
+"""
+Benchmark: event-loop latency while admins log in.
+A ticker task sleeps 1 ms in a loop and records how late it wakes up (what
+every concurrent bot update / API request would feel), while LOGINS
+password checks run either inline on the loop or through core.passwords.
+No database needed.
+
+Usage:
+    python -m benchmarks.bench_password_hashing [logins]
+"""
+import asyncio
+import hashlib
+import sys
+import time
+
+from core import passwords
+from core.config import settings
+
+
+async def ticker(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - started) * 1000 - 1)
+
+
+async def inline_check(password: str, salt: str) -> None:
+    """scrypt called directly in the coroutine: blocks the loop"""
+    hashlib.scrypt(password.encode(), salt=salt.encode(), n=settings.PASSWORD_SCRYPT_N,
+                   r=settings.PASSWORD_SCRYPT_R, p=settings.PASSWORD_SCRYPT_P,
+                   maxmem=256 * settings.PASSWORD_SCRYPT_R * (settings.PASSWORD_SCRYPT_N + settings.PASSWORD_SCRYPT_P),
+                   dklen=passwords.DKLEN)
+
+
+async def pooled_check(stored: str, salt: str):
+    return await passwords.verify_password("wrong password", stored, salt)
+
+
+async def measure(label: str, make_call, logins: int) -> None:
+    stop = asyncio.Event()
+    lags = []
+    tick = asyncio.create_task(ticker(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(make_call() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    print(f"{label:<12} {logins} logins in {elapsed * 1000:7.0f} ms | "
+          f"loop lag p50 {lags[len(lags) // 2]:6.2f} ms, p99 {p99:7.2f} ms, max {lags[-1]:7.2f} ms")
+
+
+async def main(logins: int) -> None:
+    stored, salt = await passwords.hash_password("benchmark")
+    print(f"scrypt n={settings.PASSWORD_SCRYPT_N} r={settings.PASSWORD_SCRYPT_R} "
+          f"p={settings.PASSWORD_SCRYPT_P}, {settings.PASSWORD_HASH_WORKERS} hashing threads")
+    await measure("inline", lambda: inline_check("wrong password", salt), logins)
+    await measure("thread pool", lambda: pooled_check(stored, salt), logins)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,81 @@
+"""
+Benchmark: Teremok test scoring.
+The previous calculate_result (linear search of the question per answer,
+dict accumulation, sort for the winner) against the compiled ScoreMatrix,
+for single answer sheets and for one batch of all sheets (one-hot matrix
+product when NumPy is installed). Results are checked to agree first.
+No database needed.
+
+Usage:
+    python -m benchmarks.bench_scoring [sheets]
+"""
+import random
+import sys
+import time
+
+from core import logic
+from core.logic import DIAGNOSTIC_QUESTIONS, TEREMOK_MATRIX, calculate_result, calculate_results
+
+
+def legacy_calculate_result(answers: dict) -> dict:
+    """calculate_result before the score matrix"""
+    total_scores = {}
+    for q_id_str, option_idx in answers.items():
+        q_id = int(q_id_str) if isinstance(q_id_str, str) else q_id_str
+        question = None
+        for q in DIAGNOSTIC_QUESTIONS:
+            if q.id == q_id:
+                question = q
+                break
+        if question and 0 <= option_idx < len(question.options):
+            option = question.options[option_idx]
+            for type_id, score in option.get('score', {}).items():
+                total_scores[type_id] = total_scores.get(type_id, 0) + score
+
+    if not total_scores:
+        winner_id = "bird"
+    else:
+        winner_id = sorted(total_scores.items(), key=lambda x: x[1], reverse=True)[0][0]
+    return {"type": winner_id, "scores": total_scores}
+
+
+def make_sheets(count: int) -> list:
+    rnd = random.Random(42)
+    # str keys, as they arrive in the web API JSON
+    return [
+        {str(q.id): rnd.randrange(len(q.options)) for q in DIAGNOSTIC_QUESTIONS}
+        for _ in range(count)
+    ]
+
+
+def measure(label: str, run, count: int) -> None:
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms | {elapsed / count * 1e6:6.2f} us/sheet")
+
+
+def main(count: int) -> None:
+    sheets = make_sheets(count)
+
+    # Scores must match exactly; the winner only where the old sort had no tie
+    ties = 0
+    for sheet, new in zip(sheets, calculate_results(sheets)):
+        old = legacy_calculate_result(sheet)
+        assert old["scores"] == new["scores"], sheet
+        top = max(old["scores"].values())
+        if sum(1 for s in old["scores"].values() if s == top) > 1:
+            ties += 1
+        else:
+            assert old["type"] == new["type"], sheet
+
+    print(f"{count} sheets, {len(DIAGNOSTIC_QUESTIONS)} questions, "
+          f"{len(TEREMOK_MATRIX.rows)}x{len(TEREMOK_MATRIX.type_ids)} matrix, "
+          f"numpy {'yes' if logic.np is not None else 'no'}, {ties} tied sheets")
+    measure("legacy, one by one", lambda: [legacy_calculate_result(s) for s in sheets], count)
+    measure("matrix, one by one", lambda: [calculate_result(s) for s in sheets], count)
+    measure("matrix, batch", lambda: calculate_results(sheets), count)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
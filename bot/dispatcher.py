@@ -0,0 +1,14 @@
+"""
+Dispatcher assembly shared by polling and webhook modes.
+"""
+from aiogram import Dispatcher
+
+from bot.handlers import common, lead_form, admin
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    dp.include_router(admin.router)  # Admin commands first
+    dp.include_router(common.router)
+    dp.include_router(lead_form.router)
+    return dp
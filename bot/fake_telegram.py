@@ -0,0 +1,130 @@
+"""
+Local stand-in for Telegram, for running and load-testing webhook mode
+without a real bot token or network access.
+
+FakeTelegramSession replaces the Bot API HTTP session: outgoing calls are
+recorded and answered with plausible objects (FAKE_TELEGRAM=true in .env
+makes main.py use it). The CLI plays Telegram's side of the webhook: it
+POSTs synthetic updates with the secret header and reports status codes
+and latency.
+
+Usage:
+    FAKE_TELEGRAM=true BOT_MODE=webhook WEBHOOK_SECRET=dev python main.py
+    python -m bot.fake_telegram [updates] [concurrency] [url]
+"""
+import asyncio
+import itertools
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional
+
+import httpx
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, ChatMemberMember, Message, User
+
+from core.config import settings
+
+FAKE_TOKEN = "123456:FAKE-TELEGRAM-TOKEN"
+BOT_USER = User(id=123456, is_bot=True, first_name="Fake Teremok", username="fake_teremok_bot")
+
+
+class FakeTelegramSession(BaseSession):
+    """Records Bot API calls instead of sending them"""
+
+    def __init__(self, keep: int = 1000):
+        super().__init__()
+        self.calls: deque = deque(maxlen=keep)
+        self.counts: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        name = type(method).__name__
+        params = method.model_dump(exclude_none=True)
+        self.calls.append((name, params))
+        self.counts[name] += 1
+        return self._answer(name, params, method)
+
+    def _answer(self, name: str, params: dict, method: TelegramMethod) -> Any:
+        if name == "GetMe":
+            return BOT_USER
+        if name == "GetChatMember":
+            user = User(id=params["user_id"], is_bot=False, first_name="User")
+            return ChatMemberMember(user=user)
+        if name in ("SendMessage", "SendPhoto", "SendDocument", "EditMessageText"):
+            chat_id = params.get("chat_id") or 0
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                from_user=BOT_USER,
+                text=params.get("text") or params.get("caption"),
+            )
+        if getattr(method, "__returning__", None) is bool:
+            return True
+        return None
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None,
+                             timeout: int = 30, chunk_size: int = 65536,
+                             raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+def create_fake_bot() -> Bot:
+    return Bot(token=FAKE_TOKEN, session=FakeTelegramSession())
+
+
+def make_update(update_id: int, user_id: int, text: str = "/start") -> Mapping[str, Any]:
+    """Minimal private-chat message update as Telegram sends it"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Test"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test", "username": f"user{user_id}"},
+            "text": text,
+        },
+    }
+
+
+async def replay(url: str, updates: int, concurrency: int) -> None:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": settings.WEBHOOK_SECRET}
+    statuses: Counter = Counter()
+    latencies = []
+    ids = iter(range(1, updates + 1))
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def sender():
+            for update_id in ids:
+                started = time.perf_counter()
+                body = make_update(update_id, user_id=100000 + update_id % 500)
+                try:
+                    response = await client.post(url, json=body, headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{updates} updates in {elapsed:.2f}s ({updates / elapsed:.0f}/s), concurrency {concurrency}")
+    print(f"status codes: {dict(statuses)}")
+    print(f"latency p50 {latencies[len(latencies) // 2]:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    parallel = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    target = sys.argv[3] if len(sys.argv) > 3 else f"http://localhost:{settings.PORT}{settings.WEBHOOK_PATH}"
+    asyncio.run(replay(target, count, parallel))
@@ -4,7 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
 from bot.keyboards import diagnostics_keyboard, back_to_menu_keyboard
-from core.logic import DIAGNOSTIC_QUESTIONS, calculate_result
+from core.logic import DIAGNOSTIC_QUESTIONS, calculate_result, get_question
 from core.texts import TYPES_DATA
 
 router = Router()
@@ -30,7 +30,7 @@ QUESTION_STATES = {
 async def cb_start_diagnostic(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await state.set_state(DiagnosticState.question_1)
-    await state.update_data(scores={})
+    await state.update_data(answers={})
     
     q = DIAGNOSTIC_QUESTIONS[0]
     await callback.message.edit_text(
@@ -46,24 +46,19 @@ async def cb_answer(callback: CallbackQuery, state: FSMContext):
     q_id = int(parts[1])
     opt_index = int(parts[2])
     
-    # Get current scores
+    # Collect answers (str keys: FSM storage may be JSON); scored at the end
     data = await state.get_data()
-    scores = data.get("scores", {})
+    answers = data.get("answers", {})
+    if get_question(q_id):
+        answers[str(q_id)] = opt_index
     
-    # Update scores
-    question = next((q for q in DIAGNOSTIC_QUESTIONS if q.id == q_id), None)
-    if question:
-        option_score = question.options[opt_index]['score']
-        for type_key, pts in option_score.items():
-            scores[type_key] = scores.get(type_key, 0) + pts
-    
-    await state.update_data(scores=scores)
+    await state.update_data(answers=answers)
     
     # Next question
     next_q_id = q_id + 1
     if next_q_id > len(DIAGNOSTIC_QUESTIONS):
         # Finish
-        result_id = calculate_result(scores)
+        result_id = calculate_result(answers)["type"]
         type_data = TYPES_DATA.get(result_id)
         
         await state.clear()
@@ -78,7 +73,7 @@ async def cb_answer(callback: CallbackQuery, state: FSMContext):
         return
 
     # Show next question
-    next_q = next((q for q in DIAGNOSTIC_QUESTIONS if q.id == next_q_id), None)
+    next_q = get_question(next_q_id)
     if next_q:
         # Set stat
         # Note: In aiogram FSM, setting state manually isn't strictly required if we just flow, 
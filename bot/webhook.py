@@ -0,0 +1,128 @@
+"""
+Telegram webhook mode (BOT_MODE=webhook).
+Updates arrive as POSTs on settings.WEBHOOK_PATH (route in web/routes.py),
+are checked against the secret token Telegram echoes in
+X-Telegram-Bot-Api-Secret-Token (WEBHOOK_SECRET is mandatory: without it
+anyone could post updates as an admin) and fed to the dispatcher in the request.
+A semaphore bounds concurrent updates per process; when it stays full the
+route answers 503 and Telegram re-delivers the update later, so a burst
+queues up on Telegram's side instead of in our memory.
+Any replica behind the load balancer can take any update (FSM state of the
+lead form lives in the dispatcher's storage: use a shared one with >1 replica).
+"""
+import asyncio
+import hmac
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class TelegramWebhook:
+
+    def __init__(self):
+        self.bot: Optional[Bot] = None
+        self.dp: Optional[Dispatcher] = None
+        self._semaphore = asyncio.Semaphore(settings.WEBHOOK_MAX_CONCURRENT_UPDATES)
+        self._in_flight = 0
+        self._handle_ms = 0.0
+        self.counters = {
+            "received": 0,
+            "processed": 0,
+            "errors": 0,
+            "rejected": 0,
+            "forbidden": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.dp is not None
+
+    def attach(self, bot: Bot, dp: Dispatcher) -> None:
+        if not settings.WEBHOOK_SECRET:
+            raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_SECRET")
+        self.bot = bot
+        self.dp = dp
+
+    @property
+    def url(self) -> str:
+        base = settings.WEBHOOK_BASE_URL or settings.WEB_APP_URL
+        return base.rstrip("/") + settings.WEBHOOK_PATH
+
+    async def register(self) -> None:
+        """setWebhook; idempotent, so every replica may call it on startup"""
+        await self.bot.set_webhook(
+            url=self.url,
+            secret_token=settings.WEBHOOK_SECRET,
+            max_connections=settings.WEBHOOK_MAX_CONCURRENT_UPDATES,
+            allowed_updates=self.dp.resolve_used_update_types(),
+        )
+        logger.info(f"Telegram webhook set to {self.url}")
+
+    async def startup(self) -> None:
+        await self.dp.emit_startup(bot=self.bot)
+        if settings.WEBHOOK_REGISTER:
+            await self.register()
+
+    async def shutdown(self) -> None:
+        # The webhook stays registered: other replicas keep serving it
+        await self.dp.emit_shutdown(bot=self.bot)
+
+    def check_secret(self, token: Optional[str]) -> bool:
+        ok = bool(settings.WEBHOOK_SECRET) and token is not None and hmac.compare_digest(
+            token, settings.WEBHOOK_SECRET
+        )
+        if not ok:
+            self.counters["forbidden"] += 1
+        return ok
+
+    async def feed(self, data: dict) -> bool:
+        """
+        Process one update. False: no capacity right now (caller answers 503
+        so Telegram retries). Handler errors are logged and swallowed, a
+        poison update must not be re-delivered forever.
+        """
+        self.counters["received"] += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), settings.WEBHOOK_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            logger.warning(f"Webhook back-pressure: {self._in_flight} updates in flight, update rejected")
+            return False
+
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            update = Update.model_validate(data, context={"bot": self.bot})
+            await self.dp.feed_update(self.bot, update)
+            self.counters["processed"] += 1
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.error(f"Webhook update {data.get('update_id')} failed: {e}", exc_info=True)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            # Exponential moving average of handling time
+            elapsed = (time.perf_counter() - started) * 1000
+            self._handle_ms = elapsed if not self._handle_ms else 0.9 * self._handle_ms + 0.1 * elapsed
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self._in_flight,
+            "max_concurrent": settings.WEBHOOK_MAX_CONCURRENT_UPDATES,
+            "handle_ms": round(self._handle_ms, 1),
+            **self.counters,
+        }
+
+
+telegram_webhook = TelegramWebhook()
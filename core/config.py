@@ -15,9 +15,37 @@ class Settings:
     # Web App
     WEB_APP_URL: str = os.getenv("WEB_APP_URL", "https://vostroslava.github.io/teremok_game_bot/")
     
+    # Bot updates: "polling" or "webhook" (updates on WEBHOOK_PATH of the web app)
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling").lower()
+    WEBHOOK_BASE_URL: str = os.getenv("WEBHOOK_BASE_URL", "")  # defaults to WEB_APP_URL
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")  # required in webhook mode, [A-Za-z0-9_-]
+    WEBHOOK_REGISTER: bool = os.getenv("WEBHOOK_REGISTER", "true").lower() == "true"
+    # Back-pressure: updates handled at once per process, wait for a slot before 503
+    WEBHOOK_MAX_CONCURRENT_UPDATES: int = int(os.getenv("WEBHOOK_MAX_CONCURRENT_UPDATES", "40"))
+    WEBHOOK_ACQUIRE_TIMEOUT: float = float(os.getenv("WEBHOOK_ACQUIRE_TIMEOUT", "5"))
+    # Local stand-in for the Bot API (bot/fake_telegram.py)
+    FAKE_TELEGRAM: bool = os.getenv("FAKE_TELEGRAM", "false").lower() == "true"
+    
     # Server
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
+    # python -m app.web: worker processes, event loop / HTTP parser ("auto" picks
+    # uvloop / httptools when installed), seconds for in-flight requests on shutdown
+    WEB_WORKERS: int = int(os.getenv("WEB_WORKERS", "1"))
+    WEB_LOOP: str = os.getenv("WEB_LOOP", "auto")
+    WEB_HTTP: str = os.getenv("WEB_HTTP", "auto")
+    WEB_GRACEFUL_TIMEOUT: int = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "20"))
+    # max-age of the question/type catalog APIs (revalidated by ETag afterwards)
+    CATALOG_CACHE_MAX_AGE: int = int(os.getenv("CATALOG_CACHE_MAX_AGE", "300"))
+    # Rendered result pages (LRU by count and bytes); render right after submit
+    RESULT_PAGE_CACHE_ENTRIES: int = int(os.getenv("RESULT_PAGE_CACHE_ENTRIES", "2000"))
+    RESULT_PAGE_CACHE_BYTES: int = int(os.getenv("RESULT_PAGE_CACHE_BYTES", str(32 * 1024 * 1024)))
+    RESULT_PAGE_PRERENDER: bool = os.getenv("RESULT_PAGE_PRERENDER", "true").lower() == "true"
+    # Browser / proxy cache of result pages before revalidation (ETag -> 304)
+    RESULT_PAGE_MAX_AGE: int = int(os.getenv("RESULT_PAGE_MAX_AGE", "300"))
+    # Max ids per GET /api/results
+    RESULTS_BATCH_MAX: int = int(os.getenv("RESULTS_BATCH_MAX", "200"))
     
     # Database
     DB_TYPE: str = os.getenv("DB_TYPE", "postgres") # postgres or sqlite (legacy)
@@ -27,6 +55,15 @@ class Settings:
     POSTGRES_PORT: int = int(os.getenv("POSTGRES_PORT", "5432"))
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "teremok")
     
+    # Connection pool (shared by bot and web in one process)
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_MAX_INACTIVE_LIFETIME: float = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+    DB_POOL_ACQUIRE_TIMEOUT: float = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+    # asyncpg per-connection prepared statement cache (0 = off, e.g. behind pgbouncer in transaction mode)
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
     # Legacy/Fallback
     SQLITE_DB_NAME: str = os.getenv("DB_NAME", "teremok.db")
 
@@ -38,11 +75,60 @@ class Settings:
     REQUIRED_CHANNEL_USERNAME: str = os.getenv("REQUIRED_CHANNEL_USERNAME", "testtesttest12332221")
     CHECK_SUBSCRIPTION_ENABLED: bool = os.getenv("CHECK_SUBSCRIPTION_ENABLED", "true").lower() == "true"
     
+    # Per-user answer caches of /api/check-subscription (seconds; negative = False answers)
+    USER_CACHE_MAXSIZE: int = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+    SUBSCRIPTION_CACHE_TTL: float = float(os.getenv("SUBSCRIPTION_CACHE_TTL", "300"))
+    SUBSCRIPTION_CACHE_NEGATIVE_TTL: float = float(os.getenv("SUBSCRIPTION_CACHE_NEGATIVE_TTL", "15"))
+    CONTACT_CACHE_TTL: float = float(os.getenv("CONTACT_CACHE_TTL", "3600"))
+    CONTACT_CACHE_NEGATIVE_TTL: float = float(os.getenv("CONTACT_CACHE_NEGATIVE_TTL", "60"))
+    
     # Admin Panel
     ADMIN_PANEL_SECRET: str = os.getenv("ADMIN_PANEL_SECRET", "")
+    # Signing key of admin session tokens (same for all workers; derived from
+    # BOT_TOKEN + ADMIN_PANEL_SECRET when empty; startup fails if all three are
+    # empty), lifetime and revocation check period
+    ADMIN_SESSION_SECRET: str = os.getenv("ADMIN_SESSION_SECRET", "")
+    ADMIN_SESSION_TTL: int = int(os.getenv("ADMIN_SESSION_TTL", str(86400 * 7)))
+    ADMIN_SESSION_CACHE_TTL: float = float(os.getenv("ADMIN_SESSION_CACHE_TTL", "60"))
+    # Password hashing (scrypt cost; threads = hashes at once) and login lockout per (username, IP)
+    PASSWORD_SCRYPT_N: int = int(os.getenv("PASSWORD_SCRYPT_N", "16384"))
+    PASSWORD_SCRYPT_R: int = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+    PASSWORD_SCRYPT_P: int = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    LOGIN_MAX_FAILURES: int = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+    LOGIN_FAILURE_WINDOW: float = float(os.getenv("LOGIN_FAILURE_WINDOW", "300"))
+    
+    # Background task queue (notifications and other side effects)
+    TASK_QUEUE_MAXSIZE: int = int(os.getenv("TASK_QUEUE_MAXSIZE", "1000"))
+    TASK_QUEUE_WORKERS: int = int(os.getenv("TASK_QUEUE_WORKERS", "4"))
+    TASK_MAX_ATTEMPTS: int = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+    TASK_QUEUE_DRAIN_TIMEOUT: float = float(os.getenv("TASK_QUEUE_DRAIN_TIMEOUT", "10"))
+    
+    # Manager notifications: Telegram rate limits (messages/s), burst digest, retries
+    NOTIFY_CHAT_RATE: float = float(os.getenv("NOTIFY_CHAT_RATE", "1"))
+    NOTIFY_GROUP_RATE: float = float(os.getenv("NOTIFY_GROUP_RATE", "0.33"))
+    NOTIFY_GLOBAL_RATE: float = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))
+    NOTIFY_DIGEST_THRESHOLD: int = int(os.getenv("NOTIFY_DIGEST_THRESHOLD", "5"))
+    NOTIFY_MAX_PENDING: int = int(os.getenv("NOTIFY_MAX_PENDING", "1000"))
+    NOTIFY_MAX_RETRIES: int = int(os.getenv("NOTIFY_MAX_RETRIES", "5"))
+    NOTIFY_DRAIN_TIMEOUT: float = float(os.getenv("NOTIFY_DRAIN_TIMEOUT", "5"))
     
     # Google Sheets Integration (via Apps Script Webhook)
     GOOGLE_SHEETS_ENABLED: bool = os.getenv("GOOGLE_SHEETS_ENABLED", "false").lower() == "true"
     GOOGLE_SHEETS_WEBHOOK_URL: str = os.getenv("GOOGLE_SHEETS_WEBHOOK_URL", "")
+    SHEETS_WEBHOOK_TIMEOUT: float = float(os.getenv("SHEETS_WEBHOOK_TIMEOUT", "15"))
+    SHEETS_HTTP_MAX_CONNECTIONS: int = int(os.getenv("SHEETS_HTTP_MAX_CONNECTIONS", "8"))
+    # Bulk export: parallel requests, initial rows per request, latency/body size targets
+    SHEETS_EXPORT_CONCURRENCY: int = int(os.getenv("SHEETS_EXPORT_CONCURRENCY", "4"))
+    SHEETS_EXPORT_BATCH_SIZE: int = int(os.getenv("SHEETS_EXPORT_BATCH_SIZE", "100"))
+    SHEETS_EXPORT_TARGET_SECONDS: float = float(os.getenv("SHEETS_EXPORT_TARGET_SECONDS", "3"))
+    SHEETS_EXPORT_MAX_BYTES: int = int(os.getenv("SHEETS_EXPORT_MAX_BYTES", "1000000"))
+    # Incremental export continues after the (ts, id) mark moved back this many seconds (late commits)
+    SHEETS_DELTA_OVERLAP: float = float(os.getenv("SHEETS_DELTA_OVERLAP", "60"))
+    # Outbox worker: rows per webhook call, poll interval and retry backoff (seconds)
+    SHEETS_OUTBOX_BATCH_SIZE: int = int(os.getenv("SHEETS_OUTBOX_BATCH_SIZE", "50"))
+    SHEETS_OUTBOX_FLUSH_INTERVAL: float = float(os.getenv("SHEETS_OUTBOX_FLUSH_INTERVAL", "2"))
+    SHEETS_OUTBOX_BACKOFF_BASE: float = float(os.getenv("SHEETS_OUTBOX_BACKOFF_BASE", "5"))
+    SHEETS_OUTBOX_BACKOFF_MAX: float = float(os.getenv("SHEETS_OUTBOX_BACKOFF_MAX", "900"))
 
 settings = Settings()
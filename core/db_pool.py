@@ -0,0 +1,130 @@
+"""
+Shared asyncpg connection pool.
+One pool per process, used by repositories and legacy core.database functions.
+"""
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import asyncpg
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# Counters for the admin panel
+_stats = {
+    "acquired": 0,
+    "timeouts": 0,
+    "errors": 0,
+    "wait_total_ms": 0.0,
+    "wait_max_ms": 0.0,
+    "created_at": None,
+}
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Per-connection setup: json/jsonb come back as Python objects"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+async def init_pool() -> asyncpg.Pool:
+    """Create the process-wide pool (idempotent)"""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                settings.DATABASE_URL,
+                min_size=settings.DB_POOL_MIN_SIZE,
+                max_size=settings.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_LIFETIME,
+                command_timeout=settings.DB_COMMAND_TIMEOUT,
+                # Hot queries stay prepared per connection; asyncpg re-prepares after schema changes
+                statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+                init=_init_connection,
+            )
+            _stats["created_at"] = time.time()
+            logger.info(
+                f"DB pool created (min={settings.DB_POOL_MIN_SIZE}, max={settings.DB_POOL_MAX_SIZE})"
+            )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the pool on shutdown"""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+            logger.info("DB pool closed")
+
+
+def is_pool_ready() -> bool:
+    return _pool is not None
+
+
+async def get_pool() -> asyncpg.Pool:
+    """Return the pool, creating it lazily if the lifecycle hook did not run"""
+    if _pool is None:
+        return await init_pool()
+    return _pool
+
+
+@asynccontextmanager
+async def acquire(timeout: float = None):
+    """Acquire a connection from the pool and release it afterwards"""
+    pool = await get_pool()
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=timeout or settings.DB_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _stats["timeouts"] += 1
+        logger.error("DB pool acquire timeout")
+        raise
+    except Exception:
+        _stats["errors"] += 1
+        raise
+
+    wait_ms = (time.perf_counter() - started) * 1000
+    _stats["acquired"] += 1
+    _stats["wait_total_ms"] += wait_ms
+    _stats["wait_max_ms"] = max(_stats["wait_max_ms"], wait_ms)
+
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def get_pool_stats() -> dict:
+    """Pool statistics for the admin panel"""
+    acquired = _stats["acquired"]
+    data = {
+        "ready": _pool is not None,
+        "min_size": settings.DB_POOL_MIN_SIZE,
+        "max_size": settings.DB_POOL_MAX_SIZE,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "size": 0,
+        "idle": 0,
+        "in_use": 0,
+        "acquired": acquired,
+        "timeouts": _stats["timeouts"],
+        "errors": _stats["errors"],
+        "wait_avg_ms": round(_stats["wait_total_ms"] / acquired, 2) if acquired else 0.0,
+        "wait_max_ms": round(_stats["wait_max_ms"], 2),
+    }
+    if _pool is not None:
+        data["size"] = _pool.get_size()
+        data["idle"] = _pool.get_idle_size()
+        data["in_use"] = data["size"] - data["idle"]
+    return data
@@ -1,16 +1,32 @@
+from core.task_queue import TaskQueue
 from repositories.user_repository import UserRepository
 from repositories.test_repository import TestRepository
+from repositories.stats_repository import StatsRepository
+from repositories.outbox_repository import OutboxRepository
+from repositories.sheets_export_repository import SheetsExportRepository
+from repositories.session_repository import AdminSessionRepository
 from services.user_service import UserService
 from services.test_service import TestService
 from services.auth_service import AuthService
 from services.notification_service import NotificationService
+from services.sheets_outbox_service import SheetsOutboxService
+from services.sheets_export_service import SheetsExportService
 
 # Repositories
 user_repo = UserRepository()
 test_repo = TestRepository()
+stats_repo = StatsRepository()
+outbox_repo = OutboxRepository()
+sheets_export_repo = SheetsExportRepository()
+admin_session_repo = AdminSessionRepository()
 
 # Services
 user_service = UserService(user_repo)
 test_service = TestService(test_repo)
-auth_service = AuthService(user_repo)
+auth_service = AuthService(user_repo, admin_session_repo)
 notification_service = NotificationService()
+sheets_outbox_service = SheetsOutboxService(outbox_repo)
+sheets_export_service = SheetsExportService(sheets_export_repo, user_repo, test_repo)
+
+# Background side effects (notifications)
+task_queue = TaskQueue()
@@ -1,53 +1,157 @@
 """
 Google Sheets Integration via Apps Script Webhook
-Simple HTTP POST to Google Apps Script - no auth required
+Simple HTTP POST to Google Apps Script - no auth required.
+One keep-alive HTTP client per process, opened/closed by the web lifespan.
 """
+import asyncio
 import json
 import logging
+import time
 import httpx
 from typing import Union, List, Optional
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+_client: Optional[httpx.AsyncClient] = None
 
-async def send_to_sheets(data: Union[dict, List[dict]]) -> bool:
-    """
-    Send data to Google Sheets via webhook
-    Accepts single dict or list of dicts (batch)
-    """
+
+async def init_client() -> httpx.AsyncClient:
+    """Create the shared webhook client (idempotent)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.SHEETS_WEBHOOK_TIMEOUT, connect=4.0),
+            limits=httpx.Limits(
+                max_connections=settings.SHEETS_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SHEETS_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+            # Apps Script answers a POST with 302 to the script output
+            follow_redirects=True,
+            headers={"Content-Type": "application/json"},
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _post(body: bytes) -> bool:
     webhook_url = settings.GOOGLE_SHEETS_WEBHOOK_URL
-    
     if not webhook_url:
         return False
-    
+
+    client = _client or await init_client()
     try:
-        async with httpx.AsyncClient(timeout=4.0) as client:
-            response = await client.post(
-                webhook_url,
-                json=data,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                count = len(data) if isinstance(data, list) else 1
-                logger.info(f"Sent to Google Sheets: {count} items")
-                return True
-            else:
-                logger.error(f"Google Sheets webhook error: {response.status_code}")
-                return False
-                
+        response = await client.post(webhook_url, content=body)
+        if response.status_code == 200:
+            return True
+        logger.error(f"Google Sheets webhook error: {response.status_code}")
+        return False
     except Exception as e:
         logger.error(f"Google Sheets webhook failed: {e}")
         return False
 
 
-async def export_lead_to_sheets(lead: dict) -> bool:
-    """Export a lead to Google Sheets"""
-    if not settings.GOOGLE_SHEETS_ENABLED:
-        return False
-    
-    data = {
+def _encode(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, default=str).encode()
+
+
+async def send_to_sheets(data: Union[dict, List[dict]]) -> bool:
+    """
+    Send data to Google Sheets via webhook
+    Accepts single dict or list of dicts (batch)
+    """
+    ok = await _post(_encode(data))
+    if ok:
+        count = len(data) if isinstance(data, list) else 1
+        logger.info(f"Sent to Google Sheets: {count} items")
+    return ok
+
+
+class BatchSizer:
+    """
+    Picks the next batch size from observed webhook latency: aims at
+    SHEETS_EXPORT_TARGET_SECONDS per request, halves on failure and never
+    exceeds SHEETS_EXPORT_MAX_BYTES per request body.
+    """
+
+    def __init__(self, initial: int, minimum: int = 10, maximum: int = 500):
+        self.size = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.seconds_per_row: Optional[float] = None
+
+    def next_size(self) -> int:
+        return self.size
+
+    def observe(self, rows: int, seconds: float, ok: bool) -> None:
+        if not ok:
+            self.size = max(self.minimum, self.size // 2)
+            return
+        per_row = seconds / max(rows, 1)
+        # Smooth over requests: one slow call should not collapse the size
+        if self.seconds_per_row is None:
+            self.seconds_per_row = per_row
+        else:
+            self.seconds_per_row = 0.7 * self.seconds_per_row + 0.3 * per_row
+        target = int(settings.SHEETS_EXPORT_TARGET_SECONDS / max(self.seconds_per_row, 1e-4))
+        # Grow at most x2 per step
+        self.size = max(self.minimum, min(self.maximum, target, self.size * 2))
+
+
+def _fit_bytes(rows: List[dict], size: int, minimum: int) -> tuple:
+    """Largest prefix of rows (<= size) whose body fits SHEETS_EXPORT_MAX_BYTES"""
+    batch = rows[:size]
+    body = _encode(batch)
+    while len(body) > settings.SHEETS_EXPORT_MAX_BYTES and len(batch) > minimum:
+        batch = batch[:max(minimum, len(batch) // 2)]
+        body = _encode(batch)
+    return batch, body
+
+
+async def send_bulk(rows: List[dict], concurrency: int = None) -> int:
+    """
+    Bulk export: send rows in adaptively sized batches with bounded
+    concurrency over the shared client. Rows of one call must share a
+    type (the Apps Script picks the sheet from the first item).
+    Returns the number of rows the webhook accepted.
+    """
+    concurrency = concurrency or settings.SHEETS_EXPORT_CONCURRENCY
+    sizer = BatchSizer(settings.SHEETS_EXPORT_BATCH_SIZE)
+    position = 0
+    sent = 0
+    started = time.perf_counter()
+
+    async def worker():
+        nonlocal position, sent
+        while position < len(rows):
+            # No await between reading and advancing position: workers never overlap
+            batch, body = _fit_bytes(rows[position:], sizer.next_size(), sizer.minimum)
+            position += len(batch)
+
+            call_started = time.perf_counter()
+            ok = await _post(body)
+            sizer.observe(len(batch), time.perf_counter() - call_started, ok)
+            if ok:
+                sent += len(batch)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    logger.info(
+        f"Bulk export to Google Sheets: {sent}/{len(rows)} rows in "
+        f"{time.perf_counter() - started:.1f}s (last batch size {sizer.size})"
+    )
+    return sent
+
+
+def build_lead_row(lead: dict) -> dict:
+    """Webhook payload for a lead"""
+    return {
         "type": "lead",
         "name": lead.get("name", ""),
         "role": lead.get("role", ""),
@@ -58,15 +162,10 @@ async def export_lead_to_sheets(lead: dict) -> bool:
         "user_id": str(lead.get("user_id", "")),
         "status": lead.get("status", "new")
     }
-    
-    return await send_to_sheets(data)
 
 
-async def export_test_to_sheets(test: dict, lead: Optional[dict] = None) -> bool:
-    """Export a test result to Google Sheets"""
-    if not settings.GOOGLE_SHEETS_ENABLED:
-        return False
-    
+def build_test_row(test: dict, lead: Optional[dict] = None) -> dict:
+    """Webhook payload for a test result (contact fields from lead if given)"""
     # Parse scores
     scores_str = ""
     if test.get("scores"):
@@ -78,7 +177,7 @@ async def export_test_to_sheets(test: dict, lead: Optional[dict] = None) -> bool
         except:
             scores_str = str(test.get("scores", ""))
     
-    data = {
+    return {
         "type": "test",
         "name": lead.get("name", "") if lead else test.get("name", ""),
         "role": lead.get("role", "") if lead else test.get("role", ""),
@@ -89,8 +188,20 @@ async def export_test_to_sheets(test: dict, lead: Optional[dict] = None) -> bool
         "product": test.get("product", "teremok"),
         "user_id": str(test.get("user_id", ""))
     }
-    
-    return await send_to_sheets(data)
+
+
+async def export_lead_to_sheets(lead: dict) -> bool:
+    """Export a lead to Google Sheets"""
+    if not settings.GOOGLE_SHEETS_ENABLED:
+        return False
+    return await send_to_sheets(build_lead_row(lead))
+
+
+async def export_test_to_sheets(test: dict, lead: Optional[dict] = None) -> bool:
+    """Export a test result to Google Sheets"""
+    if not settings.GOOGLE_SHEETS_ENABLED:
+        return False
+    return await send_to_sheets(build_test_row(test, lead))
 
 
 # Legacy compatibility - these do nothing now, export happens via webhook
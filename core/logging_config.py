@@ -21,7 +21,8 @@ class JSONFormatter(logging.Formatter):
 
 def setup_logging(log_level="INFO", log_file="app.log"):
     """
-    Setup logging configuration
+    Setup logging configuration (log_file=None: console only, e.g. several
+    worker processes that must not rotate one file)
     """
     logger = logging.getLogger()
     logger.setLevel(log_level)
@@ -38,11 +39,12 @@ def setup_logging(log_level="INFO", log_file="app.log"):
     logger.addHandler(console_handler)
 
     # File Handler (JSON structured for tools)
-    file_handler = RotatingFileHandler(
-        log_file, maxBytes=5*1024*1024, backupCount=5, encoding="utf-8"
-    )
-    file_handler.setFormatter(JSONFormatter())
-    logger.addHandler(file_handler)
+    if log_file:
+        file_handler = RotatingFileHandler(
+            log_file, maxBytes=5*1024*1024, backupCount=5, encoding="utf-8"
+        )
+        file_handler.setFormatter(JSONFormatter())
+        logger.addHandler(file_handler)
     
     # Quiet down some noisy libraries
     # Quiet down some noisy libraries
@@ -1,5 +1,10 @@
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional: batch scoring falls back to pure Python
+    np = None
 
 @dataclass
 class Question:
@@ -110,6 +115,102 @@ DIAGNOSTIC_QUESTIONS = [
     )
 ]
 
+# Default type when nothing was answered
+DEFAULT_TYPE = "bird"
+
+
+class ScoreMatrix:
+    """
+    Question bank compiled once into an option x type weight matrix.
+    Row r is one answer option, column c one type; an answer sheet is a
+    one-hot selection of rows, so its scores are one row sum (a batch of
+    sheets: one-hot matrix @ weights, with NumPy when installed).
+    Column order is the order types first appear in the bank and is also
+    the tie-break: equal scores go to the earlier type.
+    """
+
+    def __init__(self, questions: List[Question]):
+        self.type_ids: List[str] = []
+        columns: Dict[str, int] = {}
+        for q in questions:
+            for option in q.options:
+                for type_id in option.get('score', {}):
+                    if type_id not in columns:
+                        columns[type_id] = len(self.type_ids)
+                        self.type_ids.append(type_id)
+
+        self.questions: Dict[int, Question] = {q.id: q for q in questions}
+        # question id (int and str, answers come both ways) -> (first row, option count)
+        self.row_index: Dict[object, tuple] = {}
+        self.rows: List[tuple] = []
+        for q in questions:
+            self.row_index[q.id] = self.row_index[str(q.id)] = (len(self.rows), len(q.options))
+            for option in q.options:
+                row = [0] * len(self.type_ids)
+                for type_id, score in option.get('score', {}).items():
+                    row[columns[type_id]] += score
+                self.rows.append(tuple(row))
+        # Pure-Python path: rows are mostly zeros, keep only (column, weight)
+        self.sparse_rows = [tuple((c, w) for c, w in enumerate(row) if w) for row in self.rows]
+        self.weights = np.array(self.rows, dtype=np.int32) if np is not None else None
+
+    def row(self, question_id, option_idx) -> Optional[int]:
+        """Matrix row of an answer, None for unknown question / option"""
+        index = self.row_index.get(question_id)
+        if index is None or type(option_idx) is not int:
+            return None
+        first, count = index
+        return first + option_idx if 0 <= option_idx < count else None
+
+    def answer_rows(self, answers: dict) -> List[int]:
+        rows = (self.row(q_id, option_idx) for q_id, option_idx in answers.items())
+        return [r for r in rows if r is not None]
+
+    def score_vector(self, answers: dict) -> List[int]:
+        # One sheet: a gather-sum of its rows beats building a one-hot product
+        return self._sum_rows(self.answer_rows(answers))
+
+    def score_batch(self, batch: Iterable[dict]) -> List[List[int]]:
+        """Score vectors of many answer sheets at once"""
+        sheets = [self.answer_rows(answers) for answers in batch]
+        if self.weights is None:
+            return [self._sum_rows(rows) for rows in sheets]
+        # One-hot N x rows selection; add.at (not =) counts a repeated row twice, like the sum
+        selection = np.zeros((len(sheets), len(self.rows)), dtype=np.int32)
+        sheet_idx = np.repeat(np.arange(len(sheets)), [len(rows) for rows in sheets])
+        flat_rows = np.fromiter((r for rows in sheets for r in rows), dtype=np.intp, count=len(sheet_idx))
+        np.add.at(selection, (sheet_idx, flat_rows), 1)
+        return (selection @ self.weights).tolist()
+
+    def _sum_rows(self, rows: List[int]) -> List[int]:
+        totals = [0] * len(self.type_ids)
+        for r in rows:
+            for c, weight in self.sparse_rows[r]:
+                totals[c] += weight
+        return totals
+
+    def winner(self, vector: List[int]) -> str:
+        top = max(vector, default=0)
+        if top <= 0:
+            return DEFAULT_TYPE
+        # index() finds the first maximum: ties go to the earlier column
+        return self.type_ids[vector.index(top)]
+
+    def result(self, vector: List[int]) -> dict:
+        return {
+            "type": self.winner(vector),
+            # Only types that got points, as before
+            "scores": {t: s for t, s in zip(self.type_ids, vector) if s},
+        }
+
+
+TEREMOK_MATRIX = ScoreMatrix(DIAGNOSTIC_QUESTIONS)
+
+
+def get_question(question_id: int) -> Optional[Question]:
+    return TEREMOK_MATRIX.questions.get(question_id)
+
+
 def calculate_result(answers: dict) -> dict:
     """
     Calculate test result from user answers.
@@ -118,35 +219,11 @@ def calculate_result(answers: dict) -> dict:
         answers: dict of question_id -> option_index
         
     Returns:
-        dict with 'type', 'scores', and detailed info
+        dict with 'type' and 'scores' (type -> points, types with points only)
     """
-    # Aggregate scores from answers
-    total_scores = {}
-    
-    for q_id_str, option_idx in answers.items():
-        q_id = int(q_id_str) if isinstance(q_id_str, str) else q_id_str
-        
-        # Find question
-        question = None
-        for q in DIAGNOSTIC_QUESTIONS:
-            if q.id == q_id:
-                question = q
-                break
-        
-        if question and 0 <= option_idx < len(question.options):
-            option = question.options[option_idx]
-            for type_id, score in option.get('score', {}).items():
-                total_scores[type_id] = total_scores.get(type_id, 0) + score
-    
-    # Find winner
-    if not total_scores:
-        winner_id = "bird"
-    else:
-        sorted_scores = sorted(total_scores.items(), key=lambda x: x[1], reverse=True)
-        winner_id = sorted_scores[0][0]
-    
-    return {
-        "type": winner_id,
-        "scores": total_scores
-    }
+    return TEREMOK_MATRIX.result(TEREMOK_MATRIX.score_vector(answers))
+
 
+def calculate_results(batch: Iterable[dict]) -> List[dict]:
+    """calculate_result for many answer sheets (one matrix product with NumPy)"""
+    return [TEREMOK_MATRIX.result(vector) for vector in TEREMOK_MATRIX.score_batch(batch)]
@@ -0,0 +1,190 @@
+"""
+Versioned schema migrations.
+Migrations are numbered SQL files in /migrations (NNNN_name.sql), applied in
+order and recorded in schema_migrations. A file whose first line is
+`-- migrate:no-transaction` runs statement by statement outside a transaction
+(needed for CREATE INDEX CONCURRENTLY); statements in such files must end
+with `;` at the end of a line.
+
+    python -m core.migrate up
+    python -m core.migrate status
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sys
+from typing import List, Optional
+
+import asyncpg
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# pg_advisory_lock key, shared by every replica of the app
+LOCK_KEY = 7_340_112_009
+# Waiting replicas poll pg_try_advisory_lock: a blocking pg_advisory_lock keeps
+# a snapshot open, which CREATE INDEX CONCURRENTLY in the holder waits for
+LOCK_POLL_INTERVAL = 0.5
+
+NO_TRANSACTION_MARK = "-- migrate:no-transaction"
+
+_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+_STATEMENT_END_RE = re.compile(r";[ \t]*$", re.MULTILINE)
+
+CREATE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class Migration:
+    """One migration file"""
+
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION_MARK)
+
+    def statements(self) -> List[str]:
+        """Split a no-transaction migration into single statements"""
+        parts = _STATEMENT_END_RE.split(self.sql)
+        statements = []
+        for part in parts:
+            lines = [line for line in part.splitlines() if not line.strip().startswith("--")]
+            statement = "\n".join(lines).strip()
+            if statement:
+                statements.append(statement)
+        return statements
+
+    def __repr__(self):
+        return f"{self.version:04d}_{self.name}"
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILE_RE.match(filename)
+        if match:
+            migrations.append(
+                Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename))
+            )
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+async def _applied(conn) -> Optional[dict]:
+    """version -> checksum, or None when schema_migrations does not exist yet"""
+    if not await conn.fetchval("SELECT to_regclass('schema_migrations') IS NOT NULL"):
+        return None
+    rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+    return {r['version']: r['checksum'] for r in rows}
+
+
+async def _apply(conn, migration: Migration) -> None:
+    record = "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)"
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, migration.version, migration.name, migration.checksum)
+    else:
+        # Every statement must be idempotent (IF [NOT] EXISTS): a failure
+        # half-way leaves earlier statements applied and the file is re-run
+        for statement in migration.statements():
+            await conn.execute(statement)
+        await conn.execute(record, migration.version, migration.name, migration.checksum)
+
+
+async def _lock(conn) -> None:
+    """Take the migration lock without an open statement while waiting"""
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_KEY):
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+
+async def migrate_up() -> List[Migration]:
+    """Apply pending migrations, return the ones applied"""
+    migrations = load_migrations()
+
+    # Dedicated connection: the session-level advisory lock must not leak into
+    # the pool, and index builds must not hit the pool's command_timeout
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        # Fast path: schema is current, no lock and no DDL
+        applied = await _applied(conn)
+        if applied is not None and all(m.version in applied for m in migrations):
+            return []
+
+        await _lock(conn)
+        try:
+            await conn.execute(CREATE_TABLE_QUERY)
+            # Another replica may have migrated while we waited for the lock
+            applied = await _applied(conn)
+            pending = [m for m in migrations if m.version not in applied]
+            for migration in pending:
+                logger.info(f"Applying migration {migration}")
+                await _apply(conn, migration)
+            return pending
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+    finally:
+        await conn.close()
+
+
+async def migrate_status() -> List[dict]:
+    """Migration list with state: applied, pending or changed (file edited after apply)"""
+    migrations = load_migrations()
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        applied = await _applied(conn) or {}
+    finally:
+        await conn.close()
+
+    result = []
+    for m in migrations:
+        if m.version not in applied:
+            state = "pending"
+        elif applied[m.version] != m.checksum:
+            state = "changed"
+        else:
+            state = "applied"
+        result.append({"version": m.version, "name": m.name, "state": state})
+    return result
+
+
+async def _main(argv: list) -> int:
+    command = argv[0] if argv else None
+    if command not in ("up", "status"):
+        print("Usage: python -m core.migrate up|status")
+        return 2
+
+    logging.basicConfig(level=logging.INFO)
+    if command == "up":
+        applied = await migrate_up()
+        if applied:
+            for m in applied:
+                print(f"applied  {m}")
+        else:
+            print("Schema is up to date")
+    else:
+        for row in await migrate_status():
+            print(f"{row['state']:<8} {row['version']:04d}_{row['name']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,85 @@
+"""
+Admin password hashing: scrypt (hashlib.scrypt, memory-hard) in a small
+thread pool, so a login never blocks the event loop. scrypt releases the
+GIL while it runs; the semaphore caps concurrent hashes (CPU and RAM:
+128 * n * r bytes each).
+
+Stored format (web_admins.password_hash): "scrypt$<n>$<r>$<p>$<hex digest>",
+salt in web_admins.salt. A 64-hex-char value is the legacy
+sha256(password + salt) and is replaced on the next successful login.
+"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from .config import settings
+
+SCHEME = "scrypt"
+DKLEN = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _pool() -> Tuple[ThreadPoolExecutor, asyncio.Semaphore]:
+    global _executor, _semaphore
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+        )
+        _semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+    return _executor, _semaphore
+
+
+def _params() -> Tuple[int, int, int]:
+    return settings.PASSWORD_SCRYPT_N, settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P
+
+
+def _scrypt(password: str, salt: str, n: int, r: int, p: int) -> str:
+    return hashlib.scrypt(
+        password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+        maxmem=256 * r * (n + p), dklen=DKLEN
+    ).hex()
+
+
+async def _run(password: str, salt: str, n: int, r: int, p: int) -> str:
+    executor, semaphore = _pool()
+    async with semaphore:
+        return await asyncio.get_running_loop().run_in_executor(executor, _scrypt, password, salt, n, r, p)
+
+
+def _format(digest: str, n: int, r: int, p: int) -> str:
+    return f"{SCHEME}${n}${r}${p}${digest}"
+
+
+async def hash_password(password: str) -> Tuple[str, str]:
+    """-> (password_hash, salt) for a new or changed password"""
+    salt = secrets.token_hex(16)
+    n, r, p = _params()
+    return _format(await _run(password, salt, n, r, p), n, r, p), salt
+
+
+async def verify_password(password: str, stored: str, salt: str) -> Tuple[bool, bool]:
+    """-> (matches, needs_rehash): legacy sha256 or outdated scrypt parameters"""
+    if stored.startswith(SCHEME + "$"):
+        try:
+            _, n, r, p, digest = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+        except ValueError:
+            return False, False
+        ok = hmac.compare_digest(await _run(password, salt, n, r, p), digest)
+        return ok, ok and (n, r, p) != _params()
+
+    legacy = hashlib.sha256((password + salt).encode()).hexdigest()
+    ok = hmac.compare_digest(legacy, stored)
+    return ok, ok
+
+
+async def burn(password: str) -> None:
+    """Same work as a real check, for unknown usernames (no timing hint)"""
+    n, r, p = _params()
+    await _run(password, "0" * 32, n, r, p)
+
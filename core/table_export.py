@@ -0,0 +1,133 @@
+"""
+CSV / XLSX serialization for admin list exports.
+Rows arrive as an async iterator (keyset pages, no connection held between them). CSV leaves as a
+stream of bytes, so memory does not grow with the table size; XLSX is a
+zip archive and is written to a temporary file first (openpyxl write-only
+mode, rows not kept in memory), then sent. XLSX needs the optional
+openpyxl package.
+Text cells starting with a formula character get a leading ' so a lead's
+name or company cannot turn into a spreadsheet formula.
+"""
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Tuple
+
+# Rows buffered per yielded CSV chunk
+CSV_CHUNK_ROWS = 500
+
+# Leading characters that make Excel / Sheets evaluate a cell
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _text(value) -> str:
+    if isinstance(value, str):
+        return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, dict):
+        return ", ".join(f"{k}: {v}" for k, v in value.items())
+    return str(value)
+
+
+# (header, row -> value)
+Column = Tuple[str, Callable]
+
+LEAD_COLUMNS: List[Column] = [
+    ("User ID", lambda r: r["user_id"]),
+    ("Имя", lambda r: r["name"]),
+    ("Роль", lambda r: r["role"]),
+    ("Компания", lambda r: r["company"]),
+    ("Размер команды", lambda r: r["team_size"]),
+    ("Телефон", lambda r: r["phone"]),
+    ("Telegram", lambda r: r["telegram_username"]),
+    ("Продукт", lambda r: r["product"]),
+    ("Статус", lambda r: r["status"]),
+    ("Заметки", lambda r: r["notes"]),
+    ("Последний результат", lambda r: r["result_type"]),
+    ("Тестов", lambda r: r["test_count"]),
+    ("Создан", lambda r: r["created_at"]),
+    ("Обновлён", lambda r: r["updated_at"]),
+]
+
+TEST_COLUMNS: List[Column] = [
+    ("ID", lambda r: r["id"]),
+    ("Дата", lambda r: r["created_at"]),
+    ("User ID", lambda r: r["user_id"]),
+    ("Имя", lambda r: r["name"]),
+    ("Роль", lambda r: r["role"]),
+    ("Компания", lambda r: r["company"]),
+    ("Телефон", lambda r: r["phone"]),
+    ("Продукт", lambda r: r["product"]),
+    ("Результат", lambda r: r["result_type"]),
+    ("Баллы", lambda r: r["scores"]),
+]
+
+
+async def stream_csv(rows: AsyncIterator, columns: List[Column]) -> AsyncIterator[bytes]:
+    """CSV (UTF-8 with BOM so Excel detects the encoding), yielded in chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow([header for header, _ in columns])
+
+    pending = 0
+    async for row in rows:
+        writer.writerow([_text(get(row)) for _, get in columns])
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def xlsx_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+async def build_xlsx(rows: AsyncIterator, columns: List[Column], title: str) -> str:
+    """
+    Write rows into a temporary .xlsx (openpyxl write-only mode keeps rows
+    out of memory) and return its path; the caller deletes the file once
+    it is sent (or not).
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([header for header, _ in columns])
+    async for row in rows:
+        values = []
+        for _, get in columns:
+            value = get(row)
+            values.append(value if isinstance(value, (int, float, datetime)) or value is None else _text(value))
+        sheet.append(values)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        # Zipping is blocking work
+        await asyncio.to_thread(workbook.save, path)
+    except BaseException:
+        remove_file(path)
+        raise
+    return path
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
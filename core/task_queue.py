@@ -0,0 +1,214 @@
+"""
+In-process background task queue for side effects that must not hold up
+an HTTP response (manager notifications, etc.).
+Bounded asyncio.Queue + worker pool, per-task retry policy with
+exponential backoff, dead-letter log, graceful drain on shutdown.
+
+A task fails when it raises or returns False (NotificationService-style
+"sent?" results); anything else counts as success.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """max_attempts includes the first run; delay doubles per attempt"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class Task:
+    __slots__ = ("name", "func", "args", "kwargs", "policy", "attempt")
+
+    def __init__(self, name: str, func: Callable[..., Awaitable], args: tuple, kwargs: dict,
+                 policy: RetryPolicy):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.policy = policy
+        self.attempt = 0
+
+
+class TaskQueue:
+
+    def __init__(self, maxsize: int = None, workers: int = None):
+        self.maxsize = maxsize or settings.TASK_QUEUE_MAXSIZE
+        self.workers = workers or settings.TASK_QUEUE_WORKERS
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._delayed: dict = {}  # task -> TimerHandle of a retry waiting for its backoff
+        self._accepting = False
+        self._closed = False
+        self._in_flight = 0
+        self._done_at: deque = deque()  # completion times for throughput
+        self.dead_letters: deque = deque(maxlen=50)
+        self.counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0,
+            "dead": 0,
+            "rejected": 0,
+        }
+
+    # Lifecycle
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._accepting = True
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"task-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Task queue started ({self.workers} workers, max {self.maxsize})")
+
+    async def stop(self, timeout: float = None) -> None:
+        """Stop accepting, run what is queued (pending retries right away), then stop workers"""
+        if not self._workers:
+            return
+        self._accepting = False
+        timeout = settings.TASK_QUEUE_DRAIN_TIMEOUT if timeout is None else timeout
+
+        self._closed = True
+        for task, handle in list(self._delayed.items()):
+            handle.cancel()
+            if not self._put(task):
+                self._dead(task, "queue is full on shutdown")
+        self._delayed.clear()
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Task queue drain timed out, {self._queue.qsize()} tasks dropped")
+            while not self._queue.empty():
+                self._dead(self._queue.get_nowait(), "dropped on shutdown")
+                self._queue.task_done()
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Task queue stopped")
+
+    # Producer side
+
+    def submit(self, name: str, func: Callable[..., Awaitable], *args,
+               policy: RetryPolicy = None, **kwargs) -> bool:
+        """Queue func(*args, **kwargs); False when the queue is full or shutting down"""
+        if not self._workers and not self._closed:
+            self.start()
+        task = Task(name, func, args, kwargs, policy or RetryPolicy(settings.TASK_MAX_ATTEMPTS))
+        if not self._accepting:
+            self._dead(task, "queue is shutting down")
+            return False
+        if not self._put(task):
+            self.counters["rejected"] += 1
+            self._dead(task, "queue is full")
+            return False
+        self.counters["submitted"] += 1
+        return True
+
+    def _put(self, task: Task) -> bool:
+        try:
+            self._queue.put_nowait(task)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    # Consumer side
+
+    async def _worker(self) -> None:
+        while True:
+            task = await self._queue.get()
+            self._in_flight += 1
+            try:
+                await self._run(task)
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    async def _run(self, task: Task) -> None:
+        task.attempt += 1
+        try:
+            result = await task.func(*task.args, **task.kwargs)
+            error = "returned False" if result is False else None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if error is None:
+            self.counters["completed"] += 1
+            self._done_at.append(time.monotonic())
+            self._trim_done()
+            return
+
+        self.counters["failed"] += 1
+        if task.attempt >= task.policy.max_attempts or not self._accepting:
+            self._dead(task, error)
+            return
+
+        delay = task.policy.delay(task.attempt)
+        self.counters["retried"] += 1
+        logger.warning(f"Task {task.name} failed ({error}), retry {task.attempt + 1} in {delay:.1f}s")
+        self._schedule_retry(task, delay)
+
+    def _schedule_retry(self, task: Task, delay: float) -> None:
+        def requeue():
+            self._delayed.pop(task, None)
+            if not self._put(task):
+                self._dead(task, "queue is full on retry")
+
+        self._delayed[task] = asyncio.get_running_loop().call_later(delay, requeue)
+
+    def _dead(self, task: Task, reason: str) -> None:
+        self.counters["dead"] += 1
+        self.dead_letters.append({
+            "name": task.name,
+            "attempts": task.attempt,
+            "reason": reason,
+            "at": time.time(),
+        })
+        # No args: lead / test payloads are personal data and must not reach the log
+        logger.error(f"Dead letter: task {task.name} after {task.attempt} attempt(s): {reason}")
+
+    # Metrics
+
+    def _trim_done(self) -> None:
+        """Keep completion times of the last minute only"""
+        now = time.monotonic()
+        while self._done_at and now - self._done_at[0] > 60:
+            self._done_at.popleft()
+
+    def get_stats(self) -> dict:
+        self._trim_done()
+        return {
+            "running": bool(self._workers),
+            "workers": len(self._workers),
+            "depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": self.maxsize,
+            "in_flight": self._in_flight,
+            "delayed": len(self._delayed),
+            "per_minute": len(self._done_at),
+            **self.counters,
+            "last_dead": list(self.dead_letters)[-5:],
+        }
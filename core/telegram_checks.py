@@ -5,9 +5,17 @@ import logging
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramAPIError
 from core.config import settings
+from core.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# user_id -> subscribed; "not subscribed" expires fast so a fresh subscriber is seen quickly
+subscription_cache = TTLCache(
+    settings.USER_CACHE_MAXSIZE,
+    settings.SUBSCRIPTION_CACHE_TTL,
+    settings.SUBSCRIPTION_CACHE_NEGATIVE_TTL,
+)
+
 
 async def is_subscribed_to_required_channel(bot: Bot, user_id: int) -> bool:
     """
@@ -59,3 +67,10 @@ async def is_subscribed_to_required_channel(bot: Bot, user_id: int) -> bool:
         # Непредвиденные ошибки
         logger.error(f"Неожиданная ошибка при проверке подписки: {e}")
         return False
+
+
+async def is_subscribed_cached(bot: Bot, user_id: int) -> bool:
+    """is_subscribed_to_required_channel через кэш (одновременные запросы — один вызов API)"""
+    return await subscription_cache.get_or_load(
+        user_id, lambda: is_subscribed_to_required_channel(bot, user_id)
+    )
@@ -0,0 +1,101 @@
+"""
+Small in-process LRU cache with expiry, for per-user answers that are
+expensive to fetch (Telegram API calls, DB lookups) and cheap to be
+slightly stale. Falsy values use a separate (usually shorter) TTL, and
+concurrent misses for one key share a single loader call.
+Per process: invalidation does not reach other workers, the TTL bounds it.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class TTLCache:
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        ttl = self.ttl if value else self.negative_ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the value; a load already running for key will not store its result"""
+        self._data.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Cached value, or the result of loader() shared by all concurrent
+        callers. The load runs as its own task: a caller that is cancelled
+        (client went away) stops waiting without cancelling it for the others.
+        """
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+        load = self._inflight.get(key)
+        if load is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["misses"] += 1
+            load = asyncio.ensure_future(self._load(key, loader))
+            # Nobody may be left to await it: mark an exception as retrieved
+            load.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = load
+        return await asyncio.shield(load)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        load = asyncio.current_task()
+        try:
+            value = await loader()
+            # A save that invalidated the key while loading wins: do not cache
+            if self._inflight.get(key) is load:
+                self.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is load:
+                del self._inflight[key]
+
+    def get_stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+        served = self.counters["hits"] + self.counters["coalesced"]
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            **self.counters,
+            "hit_rate": round(100 * served / lookups, 1) if lookups else 0.0,
+        }
@@ -3,8 +3,10 @@ from aiogram import Bot, Dispatcher
 import logging
 import asyncio
 from core.config import settings
-from bot.handlers import common, materials, diagnostics, lead_form, admin
+from bot.dispatcher import create_dispatcher
+from app.runtime import create_bot, run_polling, uvicorn_options
 from core.database import ensure_db_exists
+from core.db_pool import init_pool, close_pool
 from core.logging_config import setup_logging
 from contextlib import asynccontextmanager
 
@@ -16,20 +18,16 @@ setup_logging(log_level="INFO", log_file="teremok.log")
 logger = logging.getLogger(__name__)
 
 async def start_bot(bot: Bot, dp: Dispatcher):
-    print("🤖 Бот запускается...")
-    # Include routers
-    dp.include_router(admin.router)  # Admin commands first
-    dp.include_router(common.router)
-    dp.include_router(lead_form.router)
-    
+    print("🤖 Бот запускается (polling)...")
     # Pass bot instance to web routes for notifications
     from web.routes import set_bot
     set_bot(bot)
     
-    await dp.start_polling(bot)
+    await run_polling(bot, dp)
 
 async def start_web():
-    config = uvicorn.Config(web_app, host=settings.HOST, port=settings.PORT, log_level="info", reload=True)
+    # Combined dev mode: one process, one worker; production runs python -m app.web / app.bot
+    config = uvicorn.Config(web_app, **uvicorn_options())
     server = uvicorn.Server(config)
     print(f"🌍 Web App запускается на http://{settings.HOST}:{settings.PORT}")
     await server.serve()
@@ -37,17 +35,29 @@ async def start_web():
 async def main():
     logging.basicConfig(level=logging.INFO)
     
-    # Init DB
+    # Init DB (shared pool for bot and web)
+    await init_pool()
     await ensure_db_exists()
     
-    bot = Bot(token=settings.BOT_TOKEN)
-    dp = Dispatcher()
+    bot = create_bot()
+    dp = create_dispatcher()
     
-    # Run both
-    await asyncio.gather(
-        start_bot(bot, dp),
-        start_web()
-    )
+    try:
+        if settings.BOT_MODE == "webhook":
+            # Updates come to the web app; it registers the webhook on startup
+            from web.routes import set_bot
+            set_bot(bot, dp)
+            print(f"🤖 Бот в режиме webhook: {settings.WEBHOOK_PATH}")
+            await start_web()
+        else:
+            # Run both
+            await asyncio.gather(
+                start_bot(bot, dp),
+                start_web()
+            )
+    finally:
+        await bot.session.close()
+        await close_pool()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,21 @@
+-- Legacy databases stored scores/answers as TEXT (json.dumps).
+
+DO $$
+DECLARE
+    col RECORD;
+BEGIN
+    FOR col IN
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name IN ('test_results', 'formula_rsp_results')
+          AND column_name IN ('scores', 'answers')
+          AND data_type = 'text'
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE %I ALTER COLUMN %I TYPE JSONB USING NULLIF(%I, '''')::jsonb',
+            col.table_name, col.column_name, col.column_name
+        );
+    END LOOP;
+END
+$$;
@@ -0,0 +1,31 @@
+-- Daily rollup for admin analytics (see repositories/stats_repository.py),
+-- rebuilt from raw tables so it starts consistent with history.
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day DATE NOT NULL,
+    product TEXT NOT NULL,
+    result_type TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    leads INTEGER NOT NULL DEFAULT 0,
+    tests INTEGER NOT NULL DEFAULT 0,
+    formula_tests INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product, result_type, status)
+);
+
+LOCK TABLE daily_stats, user_contacts, test_results, formula_rsp_results IN SHARE MODE;
+
+DELETE FROM daily_stats;
+
+INSERT INTO daily_stats (day, product, result_type, status, leads)
+SELECT created_at::date, COALESCE(product, 'teremok'), '', COALESCE(status, 'new'), COUNT(*)
+FROM user_contacts GROUP BY 1, 2, 4;
+
+INSERT INTO daily_stats (day, product, result_type, status, tests)
+SELECT created_at::date, COALESCE(product, 'teremok'), result_type, '', COUNT(*)
+FROM test_results GROUP BY 1, 2, 3
+ON CONFLICT (day, product, result_type, status) DO UPDATE SET tests = EXCLUDED.tests;
+
+INSERT INTO daily_stats (day, product, result_type, status, formula_tests)
+SELECT created_at::date, 'formula_rsp', primary_type_code, '', COUNT(*)
+FROM formula_rsp_results GROUP BY 1, 3
+ON CONFLICT (day, product, result_type, status) DO UPDATE SET formula_tests = EXCLUDED.formula_tests;
@@ -0,0 +1,7 @@
+-- Default web admin (admin / admin) on an empty web_admins table.
+-- Same scheme as AuthService: sha256(password + salt), 32-hex-char salt.
+
+INSERT INTO web_admins (username, password_hash, salt)
+SELECT 'admin', encode(sha256(('admin' || s.salt)::bytea), 'hex'), s.salt
+FROM (SELECT md5(random()::text || clock_timestamp()::text) AS salt) s
+WHERE NOT EXISTS (SELECT 1 FROM web_admins);
@@ -0,0 +1,3 @@
+-- Trigram matching for admin lead search.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
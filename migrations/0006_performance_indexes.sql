@@ -0,0 +1,32 @@
+-- migrate:no-transaction
+-- Built CONCURRENTLY so deploys do not lock hot tables. A failed build leaves
+-- an INVALID index: drop it by hand before re-running.
+
+-- Latest test per lead / per-lead counts (supersedes idx_tests_user_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tests_user_created ON test_results(user_id, created_at DESC, id DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_tests_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_contacts_user_id;
+
+-- Score filters
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tests_scores_gin ON test_results USING gin (scores);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_formula_rsp_scores_gin ON formula_rsp_results USING gin (scores);
+
+-- Lead search (pg_trgm)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_name_trgm ON user_contacts USING gin (name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_company_trgm ON user_contacts USING gin (company gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_phone_trgm ON user_contacts USING gin (phone gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_telegram_username_trgm ON user_contacts USING gin (telegram_username gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_phone_digits_trgm ON user_contacts USING gin ((regexp_replace(phone, '\D', '', 'g')) gin_trgm_ops);
+
+-- Keyset pagination: one (sort key, id) index per whitelisted sort column
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_created_at_key ON user_contacts(created_at, user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_updated_at_key ON user_contacts(updated_at, user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_status_key ON user_contacts((COALESCE(status, '')), user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_name_key ON user_contacts((COALESCE(name, '')), user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_company_key ON user_contacts((COALESCE(company, '')), user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_role_key ON user_contacts((COALESCE(role, '')), user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_product_key ON user_contacts((COALESCE(product, '')), user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_team_size_key ON user_contacts((COALESCE(team_size, '')), user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tests_created_at_key ON test_results(created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tests_result_type_key ON test_results((COALESCE(result_type, '')), id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tests_product_key ON test_results((COALESCE(product, '')), id);
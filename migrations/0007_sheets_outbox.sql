@@ -0,0 +1,13 @@
+-- Google Sheets export outbox, written in the same transaction as the
+-- lead/test and drained by services/sheets_outbox_service.py.
+
+CREATE TABLE IF NOT EXISTS sheets_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    payload JSONB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sheets_outbox_due ON sheets_outbox(next_attempt_at, id);
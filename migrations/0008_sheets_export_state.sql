@@ -0,0 +1,10 @@
+-- High-water marks for incremental Google Sheets export, one row per
+-- destination ('leads', 'tests'): last exported (timestamp, id).
+
+CREATE TABLE IF NOT EXISTS sheets_export_state (
+    destination TEXT PRIMARY KEY,
+    last_ts TIMESTAMP NOT NULL,
+    last_id BIGINT NOT NULL,
+    last_rows INTEGER NOT NULL DEFAULT 0,
+    exported_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
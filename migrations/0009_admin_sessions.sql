@@ -0,0 +1,19 @@
+-- Admin web sessions, one row per login (several devices per admin).
+-- The cookie carries an HMAC-signed token with the session id and expiry;
+-- this table is read only on a session-cache miss and records revocation.
+-- Replaces the single web_admins.session_token (left in place, unused).
+
+CREATE TABLE IF NOT EXISTS admin_sessions (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL REFERENCES web_admins (username) ON DELETE CASCADE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP,
+    user_agent TEXT,
+    ip TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_admin_sessions_username ON admin_sessions (username);
+CREATE INDEX IF NOT EXISTS idx_admin_sessions_expires_at ON admin_sessions (expires_at);
+
+UPDATE web_admins SET session_token = NULL WHERE session_token IS NOT NULL;
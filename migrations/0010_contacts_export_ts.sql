@@ -0,0 +1,5 @@
+-- migrate:no-transaction
+-- Keyset index for the delta Sheets export of leads: legacy rows have no
+-- updated_at and are ordered by created_at (repositories/sheets_export_repository.py).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_export_ts_key ON user_contacts((COALESCE(updated_at, created_at)), user_id);
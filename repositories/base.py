@@ -1,59 +1,61 @@
 import asyncpg
-from core.config import settings
+from contextlib import asynccontextmanager
+from core.db_pool import acquire
 from core.exceptions import RepositoryError
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+
 class BaseRepository:
-    def __init__(self):
-        self.db_url = settings.DATABASE_URL
 
-    async def get_connection(self):
-        return await asyncpg.connect(self.db_url)
+    def connection(self):
+        """Acquire a pooled connection (use as `async with`)"""
+        return acquire()
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Pooled connection inside a transaction (use as `async with`)"""
+        try:
+            async with self.connection() as conn:
+                async with conn.transaction():
+                    yield conn
+        except RepositoryError:
+            raise
+        except Exception as e:
+            logger.error(f"DB Transaction Error: {e}")
+            raise RepositoryError(f"Database error: {str(e)}")
 
     async def execute(self, query: str, *params) -> str:
         """Execute a query (INSERT, UPDATE, DELETE)"""
         try:
-            conn = await self.get_connection()
-            try:
+            async with self.connection() as conn:
                 return await conn.execute(query, *params)
-            finally:
-                await conn.close()
         except Exception as e:
             logger.error(f"DB Execute Error: {e} | Query: {query}")
             raise RepositoryError(f"Database error: {str(e)}")
 
     async def fetch_one(self, query: str, *params) -> Optional[asyncpg.Record]:
         try:
-            conn = await self.get_connection()
-            try:
+            async with self.connection() as conn:
                 return await conn.fetchrow(query, *params)
-            finally:
-                await conn.close()
         except Exception as e:
             logger.error(f"DB Fetch One Error: {e} | Query: {query}")
             raise RepositoryError(f"Database error: {str(e)}")
 
     async def fetch_all(self, query: str, *params) -> List[asyncpg.Record]:
         try:
-            conn = await self.get_connection()
-            try:
+            async with self.connection() as conn:
                 return await conn.fetch(query, *params)
-            finally:
-                await conn.close()
         except Exception as e:
             logger.error(f"DB Fetch All Error: {e} | Query: {query}")
             raise RepositoryError(f"Database error: {str(e)}")
-            
+
     async def fetch_val(self, query: str, *params) -> Any:
         try:
-            conn = await self.get_connection()
-            try:
+            async with self.connection() as conn:
                 return await conn.fetchval(query, *params)
-            finally:
-                await conn.close()
         except Exception as e:
             logger.error(f"DB Fetch Val Error: {e} | Query: {query}")
             raise RepositoryError(f"Database error: {str(e)}")
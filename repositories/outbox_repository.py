@@ -0,0 +1,72 @@
+"""
+Google Sheets export outbox (sheets_outbox).
+Rows are enqueued inside the lead/test transaction and drained by the
+background worker in services/sheets_outbox_service.py. A claimed row is leased
+(next_attempt_at moved forward) instead of locked, so no transaction stays
+open while the webhook is called and a crashed worker's rows come back
+after the lease.
+"""
+from .base import BaseRepository
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENQUEUE_QUERY = "INSERT INTO sheets_outbox (payload) VALUES ($1)"
+
+CLAIM_QUERY = """
+    UPDATE sheets_outbox SET
+        attempts = attempts + 1,
+        next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => $2)
+    WHERE id IN (
+        SELECT id FROM sheets_outbox
+        WHERE next_attempt_at <= CURRENT_TIMESTAMP
+        ORDER BY id
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, payload, attempts
+"""
+
+STATS_QUERY = """
+    SELECT
+        COUNT(*) AS depth,
+        COUNT(*) FILTER (WHERE last_error IS NOT NULL) AS retrying,
+        COALESCE(MAX(attempts), 0) AS max_attempts,
+        EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(created_at)) AS lag_seconds
+    FROM sheets_outbox
+"""
+
+
+async def enqueue_sheets(conn, payload: dict) -> None:
+    """Queue a webhook row in the caller's transaction"""
+    await conn.execute(ENQUEUE_QUERY, payload)
+
+
+class OutboxRepository(BaseRepository):
+
+    async def claim(self, limit: int, lease_seconds: float) -> List[dict]:
+        """Lease up to limit due rows, oldest first"""
+        rows = await self.fetch_all(CLAIM_QUERY, limit, float(lease_seconds))
+        return sorted((dict(r) for r in rows), key=lambda r: r['id'])
+
+    async def complete(self, ids: List[int]) -> None:
+        await self.execute("DELETE FROM sheets_outbox WHERE id = ANY($1::bigint[])", ids)
+
+    async def retry(self, ids: List[int], delay_seconds: float, error: str) -> None:
+        await self.execute(
+            """UPDATE sheets_outbox
+               SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => $2), last_error = $3
+               WHERE id = ANY($1::bigint[])""",
+            ids, float(delay_seconds), error
+        )
+
+    async def get_stats(self) -> dict:
+        row = await self.fetch_one(STATS_QUERY)
+        lag = row['lag_seconds']
+        return {
+            "depth": row['depth'],
+            "retrying": row['retrying'],
+            "max_attempts": row['max_attempts'],
+            "lag_seconds": round(float(lag), 1) if lag is not None else 0.0,
+        }
@@ -0,0 +1,105 @@
+"""
+Keyset (cursor) pagination helpers for admin lists.
+A cursor is an opaque url-safe token holding the sort column, direction,
+the sort value of the last row on the page and its id.
+Timestamp columns are nullable: NULL sorts as the greatest value (last in
+ASC, first in DESC), explicitly in ORDER BY and in the keyset condition,
+so a cursor on a NULL row continues inside the NULL block.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+
+class SortColumn:
+    """Whitelisted sort column: SQL expression, row key and value kind"""
+
+    def __init__(self, expr: str, key: str, kind: str = "text"):
+        self.expr = expr
+        self.key = key
+        self.kind = kind  # "text" (NULL sorts as '') or "ts"
+
+    def value_of(self, row: dict):
+        value = row.get(self.key)
+        if self.kind == "text":
+            return value or ""
+        return value
+
+
+def encode_cursor(sort_by: str, order: str, value, row_id) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, order, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort_by: str, order: str,
+                  column: SortColumn) -> Optional[Tuple]:
+    """
+    Return (value, id) or None if the cursor is missing, broken or for
+    another sort. value is None for a cursor on a NULL timestamp.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_sort, c_order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+
+    if c_sort != sort_by or c_order != order:
+        return None
+    if column.kind == "ts" and value is not None:
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError):
+            return None
+    return value, row_id
+
+
+def keyset_condition(column: SortColumn, id_expr: str, order: str, after: Tuple, params: List) -> str:
+    """Condition that continues after the cursor row; appends its values to params"""
+    value, row_id = after
+    op = ">" if order == "ASC" else "<"
+    if column.kind == "text":
+        params.extend([value, row_id])
+        return f"(COALESCE({column.expr}, ''), {id_expr}) {op} (${len(params) - 1}, ${len(params)})"
+
+    if value is None:
+        # Inside the NULL block: ASC ends with it, DESC continues to the values
+        params.append(row_id)
+        rest = "" if order == "ASC" else f" OR {column.expr} IS NOT NULL"
+        return f"(({column.expr} IS NULL AND {id_expr} {op} ${len(params)}){rest})"
+
+    params.extend([value, row_id])
+    cond = f"({column.expr}, {id_expr}) {op} (${len(params) - 1}, ${len(params)})"
+    # NULLs come after every value in ASC (already passed in DESC)
+    return f"({cond} OR {column.expr} IS NULL)" if order == "ASC" else cond
+
+
+def order_clause(column: SortColumn, id_expr: str, order: str) -> str:
+    if column.kind == "text":
+        return f"ORDER BY COALESCE({column.expr}, '') {order}, {id_expr} {order}"
+    nulls = "NULLS LAST" if order == "ASC" else "NULLS FIRST"
+    return f"ORDER BY {column.expr} {order} {nulls}, {id_expr} {order}"
+
+
+def resolve_sort(columns: dict, sort_by: str, sort_order: str) -> Tuple[str, SortColumn, str]:
+    """Apply the whitelist: unknown columns fall back to created_at, order to DESC"""
+    if sort_by not in columns:
+        sort_by = "created_at"
+    order = "ASC" if sort_order and sort_order.lower() == "asc" else "DESC"
+    return sort_by, columns[sort_by], order
+
+
+def build_page(rows: list, limit: int, columns: dict, sort_by: str, sort_order: str,
+               id_key: str) -> dict:
+    """Cut the extra look-ahead row and build the next cursor"""
+    sort_by, column, order = resolve_sort(columns, sort_by, sort_order)
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(sort_by, order, column.value_of(last), last[id_key])
+    return {"items": items, "next_cursor": next_cursor}
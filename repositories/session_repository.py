@@ -0,0 +1,42 @@
+"""
+Admin web sessions (admin_sessions). Looked up by id only when the
+session cache in services/auth_service.py misses.
+"""
+from .base import BaseRepository
+from datetime import datetime
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SESSION_QUERY = """
+    SELECT username FROM admin_sessions
+    WHERE id = $1 AND revoked_at IS NULL AND expires_at > CURRENT_TIMESTAMP
+"""
+
+
+class AdminSessionRepository(BaseRepository):
+
+    async def create(self, session_id: str, username: str, expires_at: datetime,
+                     user_agent: str = None, ip: str = None) -> None:
+        async with self.transaction() as conn:
+            await conn.execute(
+                """INSERT INTO admin_sessions (id, username, expires_at, user_agent, ip)
+                   VALUES ($1, $2, $3, $4, $5)""",
+                session_id, username, expires_at, user_agent, ip
+            )
+            # Housekeeping: this admin's long-dead sessions
+            await conn.execute(
+                """DELETE FROM admin_sessions
+                   WHERE username = $1 AND expires_at < CURRENT_TIMESTAMP - INTERVAL '1 day'""",
+                username
+            )
+
+    async def get_active_username(self, session_id: str) -> Optional[str]:
+        return await self.fetch_val(ACTIVE_SESSION_QUERY, session_id)
+
+    async def revoke(self, session_id: str) -> None:
+        await self.execute(
+            "UPDATE admin_sessions SET revoked_at = CURRENT_TIMESTAMP WHERE id = $1 AND revoked_at IS NULL",
+            session_id
+        )
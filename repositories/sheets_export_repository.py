@@ -0,0 +1,72 @@
+"""
+Incremental Google Sheets export: per-destination high-water marks and
+the delta queries behind them. Leads are tracked by
+(COALESCE(updated_at, created_at), user_id), so status/notes changes are
+picked up and legacy rows without updated_at are not lost; tests are immutable and tracked by
+(created_at, id). A delta reads rows strictly after the saved (ts, id)
+pair, so rows sharing the mark's timestamp are neither re-sent nor
+skipped. Both delta scans are served by the keyset indexes
+idx_contacts_export_ts_key / idx_tests_created_at_key.
+"""
+from .base import BaseRepository
+from datetime import datetime
+from typing import Optional, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEADS_QUERY = """
+    SELECT user_id, name, role, company, phone, telegram_username, team_size, status,
+           updated_at, created_at
+    FROM user_contacts {where}
+    ORDER BY COALESCE(updated_at, created_at), user_id
+"""
+
+TESTS_QUERY = """
+    SELECT t.id, t.user_id, t.result_type, t.scores, t.product, t.created_at,
+           c.name, c.role, c.company, c.phone
+    FROM test_results t
+    LEFT JOIN user_contacts c ON t.user_id = c.user_id {where}
+    ORDER BY t.created_at, t.id
+"""
+
+
+class SheetsExportRepository(BaseRepository):
+
+    async def get_mark(self, destination: str) -> Optional[dict]:
+        row = await self.fetch_one(
+            "SELECT * FROM sheets_export_state WHERE destination = $1", destination
+        )
+        return dict(row) if row else None
+
+    async def save_mark(self, destination: str, last_ts: datetime, last_id: int, rows: int) -> None:
+        await self.execute(
+            """INSERT INTO sheets_export_state (destination, last_ts, last_id, last_rows, exported_at)
+               VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+               ON CONFLICT (destination) DO UPDATE SET
+                   last_ts = EXCLUDED.last_ts,
+                   last_id = EXCLUDED.last_id,
+                   last_rows = EXCLUDED.last_rows,
+                   exported_at = EXCLUDED.exported_at""",
+            destination, last_ts, last_id, rows
+        )
+
+    async def get_leads_after(self, after: Optional[Tuple[datetime, int]]) -> List[dict]:
+        """Leads created or changed after the (export ts, user_id) mark (all leads when None)"""
+        if after is None:
+            rows = await self.fetch_all(LEADS_QUERY.format(where=""))
+        else:
+            rows = await self.fetch_all(
+                LEADS_QUERY.format(where="WHERE (COALESCE(updated_at, created_at), user_id) > ($1, $2)"), *after
+            )
+        return [dict(row) for row in rows]
+
+    async def get_tests_after(self, after: Optional[Tuple[datetime, int]]) -> List[dict]:
+        """Teremok results after the (created_at, id) mark (all results when None)"""
+        if after is None:
+            rows = await self.fetch_all(TESTS_QUERY.format(where=""))
+        else:
+            rows = await self.fetch_all(
+                TESTS_QUERY.format(where="WHERE (t.created_at, t.id) > ($1, $2)"), *after
+            )
+        return [dict(row) for row in rows]
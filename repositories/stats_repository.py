@@ -0,0 +1,104 @@
+"""
+Daily rollup (daily_stats) for admin analytics.
+One row per day x product x result_type x lead status, maintained
+incrementally by the user/test repositories in the same transaction
+as the write. Rebuild from raw tables:
+
+    python -m repositories.stats_repository rebuild
+"""
+from .base import BaseRepository
+from datetime import date
+import asyncio
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+BUMP_QUERY = """
+    INSERT INTO daily_stats (day, product, result_type, status, leads, tests, formula_tests)
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    ON CONFLICT (day, product, result_type, status) DO UPDATE SET
+        leads = daily_stats.leads + EXCLUDED.leads,
+        tests = daily_stats.tests + EXCLUDED.tests,
+        formula_tests = daily_stats.formula_tests + EXCLUDED.formula_tests
+"""
+
+# The single source of the rebuild SQL (admin API and CLI both run it).
+# migrations/0003_daily_stats.sql holds a frozen snapshot of it as the
+# one-time backfill: never edit an applied migration (its checksum is
+# recorded), change the queries here.
+REBUILD_LOCK = "LOCK TABLE daily_stats, user_contacts, test_results, formula_rsp_results IN SHARE MODE"
+
+REBUILD_QUERIES = (
+    "DELETE FROM daily_stats",
+    """
+    INSERT INTO daily_stats (day, product, result_type, status, leads)
+    SELECT created_at::date, COALESCE(product, 'teremok'), '', COALESCE(status, 'new'), COUNT(*)
+    FROM user_contacts GROUP BY 1, 2, 4
+    """,
+    """
+    INSERT INTO daily_stats (day, product, result_type, status, tests)
+    SELECT created_at::date, COALESCE(product, 'teremok'), result_type, '', COUNT(*)
+    FROM test_results GROUP BY 1, 2, 3
+    ON CONFLICT (day, product, result_type, status) DO UPDATE SET tests = EXCLUDED.tests
+    """,
+    """
+    INSERT INTO daily_stats (day, product, result_type, status, formula_tests)
+    SELECT created_at::date, 'formula_rsp', primary_type_code, '', COUNT(*)
+    FROM formula_rsp_results GROUP BY 1, 3
+    ON CONFLICT (day, product, result_type, status) DO UPDATE SET formula_tests = EXCLUDED.formula_tests
+    """,
+)
+
+
+async def _bump(conn, *params) -> None:
+    # Runs on every lead/test write; asyncpg's statement cache keeps it prepared
+    await conn.execute(BUMP_QUERY, *params)
+
+
+async def bump_lead(conn, day: date, product: str, status: str, delta: int = 1) -> None:
+    """Add delta leads to the (day, product, status) bucket"""
+    await _bump(conn, day, product or 'teremok', '', status or 'new', delta, 0, 0)
+
+
+async def bump_test(conn, day: date, product: str, result_type: str) -> None:
+    """Count one Teremok test result"""
+    await _bump(conn, day, product or 'teremok', result_type, '', 0, 1, 0)
+
+
+async def bump_formula_test(conn, day: date, type_code: str) -> None:
+    """Count one Formula RSP result"""
+    await _bump(conn, day, 'formula_rsp', type_code, '', 0, 0, 1)
+
+
+class StatsRepository(BaseRepository):
+
+    async def rebuild(self) -> int:
+        """Recompute daily_stats from raw tables, return number of rollup rows"""
+        async with self.transaction() as conn:
+            # Block concurrent writers so no increment is lost between DELETE and INSERT
+            await conn.execute(REBUILD_LOCK)
+            for query in REBUILD_QUERIES:
+                await conn.execute(query)
+            count = await conn.fetchval("SELECT COUNT(*) FROM daily_stats")
+        logger.info(f"daily_stats rebuilt: {count} rows")
+        return count
+
+
+async def _main(argv: list) -> None:
+    from core.db_pool import init_pool, close_pool
+
+    if argv[:1] != ["rebuild"]:
+        print("Usage: python -m repositories.stats_repository rebuild")
+        return
+
+    await init_pool()
+    try:
+        count = await StatsRepository().rebuild()
+        print(f"daily_stats rebuilt: {count} rows")
+    finally:
+        await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -1,5 +1,10 @@
 from .base import BaseRepository
+from core.config import settings
+from .stats_repository import bump_test, bump_formula_test
+from .outbox_repository import enqueue_sheets
+from .pagination import SortColumn, resolve_sort, decode_cursor, keyset_condition, order_clause, build_page
 from models.test_result import TestResult, FormulaResult
+from core.google_sheets import build_test_row
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
 import json
@@ -7,36 +12,99 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Keyset pagination whitelist (contact columns come from the join and are not index-backed)
+TEST_SORT_COLUMNS = {
+    "created_at": SortColumn("t.created_at", "created_at", "ts"),
+    "result_type": SortColumn("t.result_type", "result_type"),
+    "product": SortColumn("t.product", "product"),
+    "name": SortColumn("c.name", "name"),
+    "company": SortColumn("c.company", "company"),
+    "role": SortColumn("c.role", "role")
+}
+
+# Submit path: fixed SQL text, so asyncpg's per-connection statement cache keeps it prepared
+INSERT_TEST_QUERY = """
+    INSERT INTO test_results (user_id, result_type, answers, scores, product)
+    VALUES ($1, $2, $3, $4, $5) RETURNING id, created_at
+"""
+
+INSERT_FORMULA_QUERY = """
+    INSERT INTO formula_rsp_results (user_id, primary_type_code, primary_type_name, scores, answers)
+    VALUES ($1, $2, $3, $4, $5) RETURNING id, created_at
+"""
+
+# Batch lookup for /api/results: both result tables in one round-trip
+RESULTS_BY_IDS_QUERY = """
+    SELECT 'teremok' AS source, t.id, t.product, t.result_type AS type_code, NULL AS type_name,
+           t.scores, t.created_at
+    FROM test_results t
+    WHERE t.id = ANY($1::int[])
+    UNION ALL
+    SELECT 'formula_rsp', f.id, 'formula_rsp', f.primary_type_code, f.primary_type_name,
+           f.scores, f.created_at
+    FROM formula_rsp_results f
+    WHERE f.id = ANY($2::int[])
+"""
+
+# Contact fields for the Sheets row of a new result
+EXPORT_CONTACT_QUERY = "SELECT name, role, company, phone FROM user_contacts WHERE user_id = $1"
+
+def as_json_value(value):
+    """Accept both objects and legacy JSON strings for JSONB parameters"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
 class TestRepository(BaseRepository):
     
-    async def save_test_result(self, result: TestResult) -> int:
-        scores_json = json.dumps(result.scores) if isinstance(result.scores, dict) else result.scores
-        answers_json = json.dumps(result.answers) if isinstance(result.answers, dict) else result.answers
+    async def _export_contact(self, conn, user_id: int) -> Optional[dict]:
+        row = await conn.fetchrow(EXPORT_CONTACT_QUERY, user_id)
+        return dict(row) if row else None
+
+    async def save_test_result(self, result: TestResult, export: bool = False) -> int:
+        # JSONB columns: the pool codec encodes Python objects
+        scores_json = as_json_value(result.scores)
+        answers_json = as_json_value(result.answers)
         
         # Postgres requires RETURNING id
-        val = await self.fetch_val(
-            """INSERT INTO test_results (user_id, result_type, answers, scores, product)
-               VALUES ($1, $2, $3, $4, $5) RETURNING id""",
-            result.user_id, result.result_type, answers_json, scores_json, result.product
-        )
-        return val
+        async with self.transaction() as conn:
+            row = await conn.fetchrow(
+                INSERT_TEST_QUERY, result.user_id, result.result_type, answers_json, scores_json, result.product
+            )
+            await bump_test(conn, row['created_at'].date(), result.product, result.result_type)
+            if export and settings.GOOGLE_SHEETS_ENABLED:
+                await enqueue_sheets(conn, build_test_row(
+                    {"user_id": result.user_id, "result_type": result.result_type,
+                     "scores": scores_json, "product": result.product},
+                    await self._export_contact(conn, result.user_id)
+                ))
+        return row['id']
 
-    async def save_formula_result(self, result: FormulaResult) -> int:
-        scores_json = json.dumps(result.scores) if isinstance(result.scores, dict) else result.scores
-        answers_json = json.dumps(result.answers) if isinstance(result.answers, (dict, list)) else result.answers
+    async def save_formula_result(self, result: FormulaResult, export: bool = False) -> int:
+        scores_json = as_json_value(result.scores)
+        answers_json = as_json_value(result.answers)
         
-        val = await self.fetch_val(
-            """INSERT INTO formula_rsp_results 
-               (user_id, primary_type_code, primary_type_name, scores, answers)
-               VALUES ($1, $2, $3, $4, $5) RETURNING id""",
-            result.user_id, result.primary_type_code, result.primary_type_name, scores_json, answers_json
-        )
-        return val
+        async with self.transaction() as conn:
+            row = await conn.fetchrow(
+                INSERT_FORMULA_QUERY, result.user_id, result.primary_type_code, result.primary_type_name, scores_json, answers_json
+            )
+            await bump_formula_test(conn, row['created_at'].date(), result.primary_type_code)
+            if export and settings.GOOGLE_SHEETS_ENABLED:
+                await enqueue_sheets(conn, build_test_row(
+                    {"user_id": result.user_id, "result_type": result.primary_type_name,
+                     "scores": scores_json, "product": "formula_rsp"},
+                    await self._export_contact(conn, result.user_id)
+                ))
+        return row['id']
 
-    async def get_all_tests_full(self, limit: int = 100, product: str = None,
-                                  result_type: str = None, days: int = None,
-                                  sort_by: str = "created_at", sort_order: str = "desc") -> list:
-        """Get test results with contact info and sorting"""
+    def _tests_query(self, product: str = None, result_type: str = None, days: int = None,
+                     sort_by: str = "created_at", sort_order: str = "desc",
+                     cursor: str = None, score_type: str = None,
+                     min_score: float = None) -> tuple:
+        """Admin tests list query (filters, keyset) without LIMIT -> (query, params)"""
         
         query = """
             SELECT t.*, 
@@ -60,28 +128,63 @@ class TestRepository(BaseRepository):
             conditions.append(f"t.created_at >= ${len(params) + 1}")
             params.append(date_from)
         
+        if score_type and min_score is not None:
+            # `?` is answered by idx_tests_scores_gin, the range check is a recheck
+            conditions.append(
+                f"t.scores ? ${len(params) + 1} AND (t.scores->>${len(params) + 1})::numeric >= ${len(params) + 2}"
+            )
+            params.extend([score_type, min_score])
+        
+        sort_by, column, order = resolve_sort(TEST_SORT_COLUMNS, sort_by, sort_order)
+        after = decode_cursor(cursor, sort_by, order, column)
+        if after:
+            conditions.append(keyset_condition(column, "t.id", order, after, params))
+        
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-            
-        # Sorting whitelist
-        sort_columns = {
-            "created_at": "t.created_at",
-            "result_type": "t.result_type",
-            "product": "t.product",
-            "name": "c.name",
-            "company": "c.company",
-            "role": "c.role"
-        }
-        
-        sort_col = sort_columns.get(sort_by, "t.created_at")
-        order = "ASC" if sort_order and sort_order.lower() == "asc" else "DESC"
         
-        query += f" ORDER BY {sort_col} {order} LIMIT ${len(params) + 1}"
+        query += f" {order_clause(column, 't.id', order)}"
+        return query, params
+
+    async def get_all_tests_full(self, limit: int = 100, product: str = None,
+                                  result_type: str = None, days: int = None,
+                                  sort_by: str = "created_at", sort_order: str = "desc",
+                                  cursor: str = None, score_type: str = None,
+                                  min_score: float = None) -> list:
+        """Get test results with contact info, sorting and keyset pagination"""
+        query, params = self._tests_query(product, result_type, days, sort_by, sort_order,
+                                          cursor, score_type, min_score)
+        query += f" LIMIT ${len(params) + 1}"
         params.append(limit)
         
         rows = await self.fetch_all(query, *params)
         return [dict(row) for row in rows]
 
+    async def iter_tests(self, product: str = None, result_type: str = None, days: int = None,
+                         sort_by: str = "created_at", sort_order: str = "desc",
+                         score_type: str = None, min_score: float = None,
+                         page_size: int = 500):
+        """Every matching test result (no row cap), in keyset pages (see UserRepository.iter_leads)"""
+        cursor = None
+        while True:
+            page = await self.get_tests_page(page_size, product, result_type, days, sort_by, sort_order,
+                                             cursor, score_type, min_score)
+            for row in page["items"]:
+                yield row
+            cursor = page["next_cursor"]
+            if not cursor:
+                return
+
+    async def get_tests_page(self, limit: int = 50, product: str = None,
+                             result_type: str = None, days: int = None,
+                             sort_by: str = "created_at", sort_order: str = "desc",
+                             cursor: str = None, score_type: str = None,
+                             min_score: float = None) -> dict:
+        """One page of tests plus the cursor for the next page"""
+        rows = await self.get_all_tests_full(limit + 1, product, result_type, days, sort_by, sort_order,
+                                             cursor, score_type, min_score)
+        return build_page(rows, limit, TEST_SORT_COLUMNS, sort_by, sort_order, "id")
+
     async def get_recent_tests_full(self, limit: int = 10) -> list:
         """Get recent tests for dashboard"""
         return await self.get_all_tests_full(limit=limit)
@@ -100,3 +203,8 @@ class TestRepository(BaseRepository):
     async def get_formula_result_by_id(self, result_id: int) -> Optional[FormulaResult]:
         row = await self.fetch_one("SELECT * FROM formula_rsp_results WHERE id = $1", result_id)
         return FormulaResult(**dict(row)) if row else None
+
+    async def get_results_by_ids(self, teremok_ids: List[int], formula_ids: List[int]) -> List[dict]:
+        """Teremok (test_results) and Formula RSP results by id, one query"""
+        rows = await self.fetch_all(RESULTS_BY_IDS_QUERY, teremok_ids, formula_ids)
+        return [dict(row) for row in rows]
@@ -1,12 +1,92 @@
 from .base import BaseRepository
+from core.config import settings
+from .stats_repository import bump_lead
+from .outbox_repository import enqueue_sheets
+from .pagination import SortColumn, resolve_sort, decode_cursor, keyset_condition, order_clause, build_page
 from models.user import User, UserContact, Admin, WebAdmin
+from core.google_sheets import build_lead_row
 from typing import Optional, List
 import json
 import logging
+import re
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# One statement for /app/admin/dashboard and the /admin, /leads, /stats bot commands,
+# read from the daily_stats rollup. $1 = first day of the 7-day window, $2 = today
+DASHBOARD_STATS_QUERY = """
+    SELECT COALESCE(SUM(leads), 0) AS total_leads,
+           COALESCE(SUM(leads) FILTER (WHERE status = 'new'), 0) AS new_leads,
+           COALESCE(SUM(leads) FILTER (WHERE status = 'done'), 0) AS completed_leads,
+           COALESCE(SUM(leads) FILTER (WHERE day >= $1), 0) AS leads_7d,
+           COALESCE(SUM(leads) FILTER (WHERE day >= $2), 0) AS leads_today,
+           COALESCE(SUM(tests), 0) AS total_tests,
+           COALESCE(SUM(tests) FILTER (WHERE day >= $1), 0) AS tests_7d,
+           COALESCE(SUM(tests) FILTER (WHERE day >= $2), 0) AS tests_today,
+           COALESCE(SUM(formula_tests), 0) AS total_formula_tests,
+           (SELECT COALESCE(json_object_agg(status, n), '{}') FROM (
+                SELECT status, SUM(leads) AS n FROM daily_stats
+                WHERE status <> '' GROUP BY 1 HAVING SUM(leads) > 0) s) AS leads_by_status,
+           (SELECT COALESCE(json_object_agg(product, n), '{}') FROM (
+                SELECT product, SUM(leads) AS n FROM daily_stats
+                WHERE status <> '' GROUP BY 1 HAVING SUM(leads) > 0) p) AS leads_by_product,
+           (SELECT COALESCE(json_object_agg(product, n), '{}') FROM (
+                SELECT product, SUM(tests) AS n FROM daily_stats
+                GROUP BY 1 HAVING SUM(tests) > 0) tp) AS tests_by_product
+    FROM daily_stats
+"""
+
+# Chart bucket whitelist: name -> (date_trunc unit, series step, label format)
+CHART_BUCKETS = {
+    "hour": ("hour", "1 hour", "%m-%d %H:00"),
+    "day": ("day", "1 day", "%m-%d"),
+    "week": ("week", "1 week", "%m-%d"),
+    "month": ("month", "1 month", "%Y-%m"),
+}
+
+# Keyset pagination whitelist (each backed by a (column, user_id) index)
+LEAD_SORT_COLUMNS = {
+    "created_at": SortColumn("c.created_at", "created_at", "ts"),
+    "updated_at": SortColumn("c.updated_at", "updated_at", "ts"),
+    "status": SortColumn("c.status", "status"),
+    "name": SortColumn("c.name", "name"),
+    "company": SortColumn("c.company", "company"),
+    "role": SortColumn("c.role", "role"),
+    "product": SortColumn("c.product", "product"),
+    "team_size": SortColumn("c.team_size", "team_size")
+}
+
+PHONE_DIGITS_SQL = "regexp_replace(c.phone, '\\D', '', 'g')"
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def lead_search_condition(search: str, params: list, fuzzy: bool = False) -> str:
+    """Substring match on name/company/telegram/phone (pg_trgm GIN-backed), appends params"""
+    term = search.strip()
+    params.append(f"%{escape_like(term)}%")
+    like = f"${len(params)}"
+    parts = [
+        f"c.name ILIKE {like}",
+        f"c.company ILIKE {like}",
+        f"c.telegram_username ILIKE {like}",
+    ]
+
+    digits = re.sub(r"\D", "", term)
+    if len(digits) >= 3:
+        params.append(f"%{digits}%")
+        parts.append(f"{PHONE_DIGITS_SQL} LIKE ${len(params)}")
+    else:
+        parts.append(f"c.phone ILIKE {like}")
+
+    if fuzzy:
+        # word_similarity operator tolerates typos in names
+        params.append(term)
+        parts.append(f"${len(params)} <% c.name")
+
+    return "(" + " OR ".join(parts) + ")"
+
 class UserRepository(BaseRepository):
     
     # Telegram Users
@@ -23,25 +103,42 @@ class UserRepository(BaseRepository):
             user_id, contact_info, message
         )
 
-    async def save_contact(self, contact: UserContact) -> None:
-        await self.execute("""
-            INSERT INTO user_contacts 
-            (user_id, name, role, company, team_size, phone, telegram_username, product, updated_at, status, notes)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CURRENT_TIMESTAMP, $9, $10)
-            ON CONFLICT(user_id) DO UPDATE SET
-                name = excluded.name,
-                role = excluded.role,
-                company = excluded.company,
-                team_size = excluded.team_size,
-                phone = excluded.phone,
-                telegram_username = excluded.telegram_username,
-                product = excluded.product,
-                updated_at = CURRENT_TIMESTAMP
-        """, 
-            contact.user_id, contact.name, contact.role, contact.company, 
-            contact.team_size, contact.phone, contact.telegram_username, 
-            contact.product, contact.status, contact.notes
-        )
+    async def save_contact(self, contact: UserContact, export: bool = False) -> None:
+        """Upsert a contact; export=True also queues it for Google Sheets"""
+        async with self.transaction() as conn:
+            old = await conn.fetchrow(
+                "SELECT product, status, created_at FROM user_contacts WHERE user_id = $1 FOR UPDATE",
+                contact.user_id
+            )
+            row = await conn.fetchrow("""
+                INSERT INTO user_contacts 
+                (user_id, name, role, company, team_size, phone, telegram_username, product, updated_at, status, notes)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CURRENT_TIMESTAMP, $9, $10)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    name = excluded.name,
+                    role = excluded.role,
+                    company = excluded.company,
+                    team_size = excluded.team_size,
+                    phone = excluded.phone,
+                    telegram_username = excluded.telegram_username,
+                    product = excluded.product,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING (xmax = 0) AS inserted, product, status, created_at
+            """, 
+                contact.user_id, contact.name, contact.role, contact.company, 
+                contact.team_size, contact.phone, contact.telegram_username, 
+                contact.product, contact.status, contact.notes
+            )
+
+            # Keep daily_stats in sync: new lead, or lead moved to another product
+            if row['inserted']:
+                await bump_lead(conn, row['created_at'].date(), row['product'], row['status'])
+            elif old and old['product'] != row['product']:
+                await bump_lead(conn, old['created_at'].date(), old['product'], old['status'], -1)
+                await bump_lead(conn, row['created_at'].date(), row['product'], row['status'])
+
+            if export and settings.GOOGLE_SHEETS_ENABLED:
+                await enqueue_sheets(conn, build_lead_row({**contact.__dict__, "status": row['status']}))
 
     async def get_contact(self, user_id: int) -> Optional[UserContact]:
         row = await self.fetch_one("SELECT * FROM user_contacts WHERE user_id = $1", user_id)
@@ -54,37 +151,50 @@ class UserRepository(BaseRepository):
         val = await self.fetch_val("SELECT 1 FROM user_contacts WHERE user_id = $1", user_id)
         return val is not None
 
-    async def update_status(self, user_id: int, status: str, notes: str = None) -> None:
-        if notes is not None:
-            await self.execute(
-                "UPDATE user_contacts SET status = $1, notes = $2, updated_at = CURRENT_TIMESTAMP WHERE user_id = $3",
-                status, notes, user_id
-            )
-        else:
-            await self.execute(
-                "UPDATE user_contacts SET status = $1, updated_at = CURRENT_TIMESTAMP WHERE user_id = $2",
-                status, user_id
+    async def update_status(self, user_id: int, status: str, notes: str = None,
+                            export: bool = False) -> None:
+        """Change lead status; export=True also queues the updated lead for Google Sheets"""
+        async with self.transaction() as conn:
+            old = await conn.fetchrow(
+                "SELECT product, status, created_at FROM user_contacts WHERE user_id = $1 FOR UPDATE",
+                user_id
             )
+            if notes is not None:
+                row = await conn.fetchrow(
+                    "UPDATE user_contacts SET status = $1, notes = $2, updated_at = CURRENT_TIMESTAMP WHERE user_id = $3 RETURNING *",
+                    status, notes, user_id
+                )
+            else:
+                row = await conn.fetchrow(
+                    "UPDATE user_contacts SET status = $1, updated_at = CURRENT_TIMESTAMP WHERE user_id = $2 RETURNING *",
+                    status, user_id
+                )
+
+            # Move the lead between status buckets in daily_stats
+            if old and (old['status'] or 'new') != (status or 'new'):
+                day = old['created_at'].date()
+                await bump_lead(conn, day, old['product'], old['status'], -1)
+                await bump_lead(conn, day, old['product'], status)
+
+            # The Apps Script upserts by User ID: the sheet row gets the new status
+            if export and row and settings.GOOGLE_SHEETS_ENABLED:
+                await enqueue_sheets(conn, build_lead_row(dict(row)))
 
     # Web Admins
     async def get_web_admin_by_username(self, username: str) -> Optional[WebAdmin]:
         row = await self.fetch_one("SELECT * FROM web_admins WHERE username = $1", username)
         return WebAdmin(**dict(row)) if row else None
 
-    async def get_web_admin_by_token(self, token: str) -> Optional[WebAdmin]:
-        row = await self.fetch_one("SELECT * FROM web_admins WHERE session_token = $1", token)
-        return WebAdmin(**dict(row)) if row else None
-
     async def create_web_admin(self, admin: WebAdmin) -> None:
         await self.execute(
             "INSERT INTO web_admins (username, password_hash, salt) VALUES ($1, $2, $3)",
             admin.username, admin.password_hash, admin.salt
         )
 
-    async def set_session_token(self, username: str, token: str) -> None:
+    async def update_web_admin_password(self, username: str, password_hash: str, salt: str) -> None:
         await self.execute(
-            "UPDATE web_admins SET session_token = $1 WHERE username = $2",
-            token, username
+            "UPDATE web_admins SET password_hash = $1, salt = $2 WHERE username = $3",
+            password_hash, salt, username
         )
 
     # Telegram Admins
@@ -111,86 +221,100 @@ class UserRepository(BaseRepository):
 
     # Statistics
     async def get_statistics(self, days: int = None) -> dict:
-        stats = {}
-        
-        # Total counts
-        stats['total_leads'] = await self.fetch_val("SELECT COUNT(*) FROM user_contacts")
-        stats['total_tests'] = await self.fetch_val("SELECT COUNT(*) FROM test_results")
-        
-        # Counts by status
-        stats['new_leads'] = await self.fetch_val("SELECT COUNT(*) FROM user_contacts WHERE status = 'new'")
-        stats['completed_leads'] = await self.fetch_val("SELECT COUNT(*) FROM user_contacts WHERE status = 'done'")
-        
-        # Recent activity (7 days)
-        date_7d = datetime.now() - timedelta(days=7)
-        
-        stats['leads_7d'] = await self.fetch_val(
-            "SELECT COUNT(*) FROM user_contacts WHERE created_at >= $1", date_7d
-        )
-        
-        stats['tests_7d'] = await self.fetch_val(
-            "SELECT COUNT(*) FROM test_results WHERE created_at >= $1", date_7d
-        )
-        
-        # Today
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        stats['leads_today'] = await self.fetch_val(
-            "SELECT COUNT(*) FROM user_contacts WHERE created_at >= $1", today
-        )
-        
-        stats['tests_today'] = await self.fetch_val(
-            "SELECT COUNT(*) FROM test_results WHERE created_at >= $1", today
-        )
-        
+        """
+        All dashboard counters in a single round-trip. daily_stats has day
+        granularity: *_7d are the last 7 calendar days including today,
+        *_today is since midnight.
+        """
+        today = datetime.now().date()
+        date_7d = today - timedelta(days=6)
+
+        row = await self.fetch_one(DASHBOARD_STATS_QUERY, date_7d, today)
+        stats = dict(row)
+
+        for key in ("leads_by_status", "leads_by_product", "tests_by_product"):
+            value = stats.get(key)
+            stats[key] = json.loads(value) if isinstance(value, str) else (value or {})
+
         return stats
 
-    async def get_daily_statistics(self, days: int = 7) -> dict:
-        """Get daily stats for charts"""
-        
-        today = datetime.now().date()
-        dates = [(today - timedelta(days=i)).isoformat() for i in range(days-1, -1, -1)]
-        
-        # Prepare result structure
-        result = {
-            "labels": [d[5:] for d in dates], # MM-DD
-            "leads": [],
-            "tests": []
-        }
-        
-        for date_str in dates:
-            # We need datetime objects for asyncpg if column is timestamp
-            # But here we are comparing created_at (timestamp) with date strings?
-            # Postgres can cast string to timestamp.
-            # Ideally:
-            d_start = datetime.strptime(date_str, "%Y-%m-%d")
-            d_end = d_start + timedelta(days=1)
-            
-            leads_count = await self.fetch_val(
-                "SELECT COUNT(*) FROM user_contacts WHERE created_at >= $1 AND created_at < $2",
-                d_start, d_end
-            )
-            
-            tests_count = await self.fetch_val(
-                "SELECT COUNT(*) FROM test_results WHERE created_at >= $1 AND created_at < $2",
-                d_start, d_end
+    async def get_daily_statistics(self, days: int = 7, bucket: str = "day") -> dict:
+        """Leads/tests per bucket for charts (one query for any window)"""
+        unit, step, label_format = CHART_BUCKETS.get(bucket, CHART_BUCKETS["day"])
+        now = datetime.now()
+
+        # unit/step come from the whitelist above, dates are bound as parameters.
+        # Day and coarser buckets read the daily_stats rollup, hours need raw rows.
+        if unit == "hour":
+            counts = """
+                SELECT date_trunc('hour', created_at) AS bucket, COUNT(*) AS leads, 0 AS tests
+                FROM user_contacts
+                WHERE created_at >= date_trunc('hour', $1::timestamp + interval '1 hour')
+                GROUP BY 1
+                UNION ALL
+                SELECT date_trunc('hour', created_at), 0, COUNT(*)
+                FROM test_results
+                WHERE created_at >= date_trunc('hour', $1::timestamp + interval '1 hour')
+                GROUP BY 1
+            """
+        else:
+            counts = f"""
+                SELECT date_trunc('{unit}', day::timestamp) AS bucket, leads, tests
+                FROM daily_stats
+                WHERE day >= date_trunc('{unit}', $1::timestamp + interval '{step}')::date
+            """
+
+        query = f"""
+            WITH buckets AS (
+                SELECT generate_series(
+                    date_trunc('{unit}', $1::timestamp + interval '{step}'),
+                    date_trunc('{unit}', $2::timestamp),
+                    interval '{step}'
+                ) AS bucket
+            ), counts AS (
+                SELECT bucket, SUM(leads) AS leads, SUM(tests) AS tests
+                FROM ({counts}) c
+                GROUP BY bucket
             )
-            
-            result["leads"].append(leads_count)
-            result["tests"].append(tests_count)
-            
-        return result
+            SELECT b.bucket, COALESCE(c.leads, 0) AS leads, COALESCE(c.tests, 0) AS tests
+            FROM buckets b
+            LEFT JOIN counts c ON c.bucket = b.bucket
+            ORDER BY b.bucket
+        """
+        rows = await self.fetch_all(query, now - timedelta(days=days), now)
 
-    async def get_all_leads_full(self, limit: int = 100, status: str = None,
-                                  search: str = None, days: int = None,
-                                  sort_by: str = "created_at", sort_order: str = "desc") -> list:
-        """Get leads with full info, filters, search and sorting"""
+        return {
+            "labels": [row["bucket"].strftime(label_format) for row in rows],
+            "leads": [row["leads"] for row in rows],
+            "tests": [row["tests"] for row in rows]
+        }
+
+    def _leads_query(self, status: str = None, search: str = None, days: int = None,
+                     sort_by: str = "created_at", sort_order: str = "desc",
+                     cursor: str = None) -> tuple:
+        """Admin leads list query (filters, search, keyset) without LIMIT -> (query, params)"""
         
+        # Both laterals are served by idx_tests_user_created (user_id, created_at DESC)
         query = """
             SELECT c.*, 
                    t.result_type, t.scores as test_scores, t.created_at as test_date,
-                   t.id as test_id
+                   t.id as test_id,
+                   s.test_count, s.first_test_at, s.last_test_at
             FROM user_contacts c 
-            LEFT JOIN test_results t ON c.user_id = t.user_id
+            LEFT JOIN LATERAL (
+                SELECT id, result_type, scores, created_at
+                FROM test_results
+                WHERE user_id = c.user_id
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            ) t ON true
+            LEFT JOIN LATERAL (
+                SELECT COUNT(*) AS test_count,
+                       MIN(created_at) AS first_test_at,
+                       MAX(created_at) AS last_test_at
+                FROM test_results
+                WHERE user_id = c.user_id
+            ) s ON true
         """
         conditions = []
         params = []
@@ -205,34 +329,80 @@ class UserRepository(BaseRepository):
             params.append(date_from)
         
         if search:
-            conditions.append(f"(c.name ILIKE ${len(params) + 1} OR c.company ILIKE ${len(params) + 2} OR c.phone ILIKE ${len(params) + 3})")
-            search_term = f"%{search}%"
-            params.extend([search_term, search_term, search_term])
+            conditions.append(lead_search_condition(search, params))
+        
+        sort_by, column, order = resolve_sort(LEAD_SORT_COLUMNS, sort_by, sort_order)
+        after = decode_cursor(cursor, sort_by, order, column)
+        if after:
+            conditions.append(keyset_condition(column, "c.user_id", order, after, params))
         
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
         
-        # Sorting whitelist
-        sort_columns = {
-            "created_at": "c.created_at",
-            "updated_at": "c.updated_at",
-            "status": "c.status",
-            "name": "c.name",
-            "company": "c.company",
-            "role": "c.role",
-            "product": "c.product",
-            "team_size": "c.team_size"
-        }
-        
-        sort_col = sort_columns.get(sort_by, "c.created_at")
-        order = "ASC" if sort_order and sort_order.lower() == "asc" else "DESC"
-        
-        query += f" ORDER BY {sort_col} {order} LIMIT ${len(params) + 1}"
+        query += f" {order_clause(column, 'c.user_id', order)}"
+        return query, params
+
+    async def get_all_leads_full(self, limit: int = 100, status: str = None,
+                                  search: str = None, days: int = None,
+                                  sort_by: str = "created_at", sort_order: str = "desc",
+                                  cursor: str = None) -> list:
+        """Get leads (one row per contact, with latest test), filters, search and keyset pagination"""
+        query, params = self._leads_query(status, search, days, sort_by, sort_order, cursor)
+        query += f" LIMIT ${len(params) + 1}"
         params.append(limit)
         
         rows = await self.fetch_all(query, *params)
         return [dict(row) for row in rows]
 
+    async def iter_leads(self, status: str = None, search: str = None, days: int = None,
+                         sort_by: str = "created_at", sort_order: str = "desc",
+                         page_size: int = 500):
+        """
+        Every matching lead (no row cap), fetched in keyset pages: each page
+        takes a pooled connection only for its query, so a slow or stalled
+        download does not hold a connection / transaction open.
+        """
+        cursor = None
+        while True:
+            page = await self.get_leads_page(page_size, status, search, days, sort_by, sort_order, cursor)
+            for row in page["items"]:
+                yield row
+            cursor = page["next_cursor"]
+            if not cursor:
+                return
+
+    async def get_leads_page(self, limit: int = 50, status: str = None,
+                             search: str = None, days: int = None,
+                             sort_by: str = "created_at", sort_order: str = "desc",
+                             cursor: str = None) -> dict:
+        """One page of leads plus the cursor for the next page"""
+        rows = await self.get_all_leads_full(limit + 1, status, search, days, sort_by, sort_order, cursor)
+        return build_page(rows, limit, LEAD_SORT_COLUMNS, sort_by, sort_order, "user_id")
+
+    async def search_leads(self, query: str, limit: int = 10) -> list:
+        """Ranked top-N leads for admin typeahead"""
+        params = []
+        condition = lead_search_condition(query, params, fuzzy=True)
+        params.append(query.strip())
+        q = f"${len(params)}"
+        params.append(limit)
+
+        rows = await self.fetch_all(f"""
+            SELECT c.user_id, c.name, c.role, c.company, c.phone, c.telegram_username,
+                   c.status, c.product, c.created_at,
+                   GREATEST(
+                       word_similarity({q}, c.name),
+                       word_similarity({q}, COALESCE(c.company, '')),
+                       word_similarity({q}, COALESCE(c.telegram_username, '')),
+                       CASE WHEN {PHONE_DIGITS_SQL} = regexp_replace({q}, '\\D', '', 'g') THEN 1 ELSE 0 END
+                   ) AS rank
+            FROM user_contacts c
+            WHERE {condition}
+            ORDER BY rank DESC, c.created_at DESC
+            LIMIT ${len(params)}
+        """, *params)
+        return [dict(row) for row in rows]
+
     async def get_recent_leads_full(self, limit: int = 10) -> list:
         """Get recent leads for dashboard"""
         return await self.get_all_leads_full(limit=limit)
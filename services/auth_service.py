@@ -1,36 +1,188 @@
 import secrets
 import hashlib
+import hmac
+import base64
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
 from repositories.user_repository import UserRepository
+from repositories.session_repository import AdminSessionRepository
 from models.user import WebAdmin
+from core.config import settings
+from core.ttl_cache import TTLCache
+from core import passwords
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = "v1"
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _session_secret() -> bytes:
+    if settings.ADMIN_SESSION_SECRET:
+        return settings.ADMIN_SESSION_SECRET.encode()
+    if not (settings.BOT_TOKEN or settings.ADMIN_PANEL_SECRET):
+        # sha256("admin-session::") would be a key anyone can compute
+        raise RuntimeError("Admin sessions require ADMIN_SESSION_SECRET (or BOT_TOKEN / ADMIN_PANEL_SECRET)")
+    # Same in every worker process: derived from the deployment's secrets
+    return hashlib.sha256(
+        f"admin-session:{settings.BOT_TOKEN}:{settings.ADMIN_PANEL_SECRET}".encode()
+    ).digest()
+
+
+class LoginThrottle:
+    """
+    Failed logins per (username, client IP) in a sliding window (per
+    process). Keyed by IP too, so guessing from one address cannot lock
+    the real admin out everywhere. Keys are kept in last-failure order:
+    expired ones are swept from the front and at most max_keys are kept.
+    """
+
+    def __init__(self, max_failures: int, window: float, max_keys: int = 10000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        self._failures: "OrderedDict[tuple, deque]" = OrderedDict()  # key -> monotonic times
+
+    def _recent(self, key: tuple) -> deque:
+        times = self._failures.get(key)
+        if times is None:
+            return deque()
+        now = time.monotonic()
+        while times and now - times[0] > self.window:
+            times.popleft()
+        if not times:
+            del self._failures[key]
+        return times
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        while self._failures:
+            key, times = next(iter(self._failures.items()))
+            if len(self._failures) <= self.max_keys and now - times[-1] <= self.window:
+                break
+            del self._failures[key]
+
+    def retry_after(self, username: str, ip: str = None) -> float:
+        """Seconds until the next attempt is allowed, 0 if allowed now"""
+        times = self._recent((username, ip))
+        if len(times) < self.max_failures:
+            return 0.0
+        return max(0.0, self.window - (time.monotonic() - times[0]))
+
+    def failed(self, username: str, ip: str = None) -> None:
+        key = (username, ip)
+        self._recent(key)
+        times = self._failures.pop(key, None) or deque(maxlen=self.max_failures)
+        times.append(time.monotonic())
+        self._failures[key] = times
+        self._sweep()
+
+    def succeeded(self, username: str, ip: str = None) -> None:
+        self._failures.pop((username, ip), None)
+
 
 class AuthService:
-    def __init__(self, user_repo: UserRepository):
+    """
+    Admin sessions: the cookie holds "v1.<session id>.<expires>.<HMAC>".
+    Forged or expired tokens are rejected without touching the DB; a valid
+    one is checked against admin_sessions (revocation) once per
+    ADMIN_SESSION_CACHE_TTL and then served from memory. A logout is seen
+    by other worker processes within that TTL.
+    """
+
+    def __init__(self, user_repo: UserRepository, session_repo: AdminSessionRepository = None):
         self.user_repo = user_repo
+        self.session_repo = session_repo or AdminSessionRepository()
+        self._secret = _session_secret()
+        # session id -> username (None: unknown/revoked)
+        self.session_cache = TTLCache(1000, settings.ADMIN_SESSION_CACHE_TTL)
+        self.login_throttle = LoginThrottle(settings.LOGIN_MAX_FAILURES, settings.LOGIN_FAILURE_WINDOW)
+
+    def _sign(self, payload: str) -> str:
+        return _b64(hmac.new(self._secret, payload.encode(), hashlib.sha256).digest())
+
+    def _issue_token(self, session_id: str, expires: int) -> str:
+        payload = f"{TOKEN_VERSION}.{session_id}.{expires}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def _read_token(self, token: str) -> str | None:
+        """Session id of a well-signed, unexpired token"""
+        try:
+            version, session_id, expires, signature = token.split(".")
+            expires = int(expires)
+        except (ValueError, AttributeError):
+            return None
+        if version != TOKEN_VERSION or expires < time.time():
+            return None
+        if not hmac.compare_digest(signature, self._sign(f"{version}.{session_id}.{expires}")):
+            return None
+        return session_id
+
+    def login_retry_after(self, username: str, ip: str = None) -> float:
+        """>0 while the username is locked out for this client after repeated failures"""
+        return self.login_throttle.retry_after(username, ip)
+
+    async def verify_password(self, username: str, password: str, ip: str = None) -> bool:
+        """Verify admin credentials (hashing runs off the event loop, see core/passwords.py)"""
+        if self.login_throttle.retry_after(username, ip):
+            return False
 
-    async def verify_password(self, username: str, password: str) -> bool:
-        """Verify admin credentials"""
         admin = await self.user_repo.get_web_admin_by_username(username)
         if not admin:
+            await passwords.burn(password)
+            self.login_throttle.failed(username, ip)
+            return False
+
+        ok, needs_rehash = await passwords.verify_password(password, admin.password_hash, admin.salt)
+        if not ok:
+            self.login_throttle.failed(username, ip)
             return False
-        
-        input_hash = hashlib.sha256((password + admin.salt).encode()).hexdigest()
-        return input_hash == admin.password_hash
 
-    async def create_session(self, username: str) -> str:
-        """Create new session and return token"""
-        token = secrets.token_hex(32)
-        await self.user_repo.set_session_token(username, token)
-        return token
+        self.login_throttle.succeeded(username, ip)
+        if needs_rehash:
+            # Legacy sha256 or outdated scrypt parameters: upgrade now that we know the password
+            password_hash, salt = await passwords.hash_password(password)
+            await self.user_repo.update_web_admin_password(username, password_hash, salt)
+            logger.info(f"Password hash of web admin {username} upgraded")
+        return True
+
+    async def create_session(self, username: str, user_agent: str = None, ip: str = None) -> str:
+        """Create new session (other devices stay logged in) and return token"""
+        session_id = secrets.token_urlsafe(24)
+        expires = int(time.time()) + settings.ADMIN_SESSION_TTL
+        await self.session_repo.create(
+            session_id, username, datetime.now() + timedelta(seconds=settings.ADMIN_SESSION_TTL),
+            user_agent, ip
+        )
+        self.session_cache.set(session_id, username)
+        return self._issue_token(session_id, expires)
 
     async def get_user_from_token(self, token: str) -> str | None:
         """Get username from valid token"""
-        admin = await self.user_repo.get_web_admin_by_token(token)
-        return admin.username if admin else None
+        session_id = self._read_token(token)
+        if not session_id:
+            return None
+        return await self.session_cache.get_or_load(
+            session_id, lambda: self.session_repo.get_active_username(session_id)
+        )
+
+    async def revoke_session(self, token: str) -> None:
+        """Logout: the session stops working here at once, in other workers within the cache TTL"""
+        session_id = self._read_token(token)
+        if not session_id:
+            return
+        await self.session_repo.revoke(session_id)
+        self.session_cache.invalidate(session_id)
+        self.session_cache.set(session_id, None)
 
     async def register_admin(self, username: str, password: str) -> None:
         """Register new admin"""
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
+        password_hash, salt = await passwords.hash_password(password)
         
         admin = WebAdmin(
             username=username,
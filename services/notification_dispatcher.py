@@ -0,0 +1,234 @@
+"""
+Rate-limited delivery of manager notifications.
+Telegram allows about 1 message/s per chat (20/min in groups) and ~30/s
+per bot; above that it answers 429 RetryAfter. Messages wait in a per-chat
+queue and leave through per-chat and global token buckets; a RetryAfter
+pauses the chat and the message is re-sent afterwards. When a burst piles
+up (NOTIFY_DIGEST_THRESHOLD or more waiting) the whole backlog goes out as
+one digest message instead of N separate ones.
+"""
+import asyncio
+import html
+import logging
+import re
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Telegram message length limit (with room for the "and N more" tail)
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_RESERVE = 100
+
+# Digest sections: kind -> title
+DIGEST_TITLES = {
+    "lead": "📩 <b>Новые заявки</b>",
+    "test": "🧩 <b>Прохождения тестов</b>",
+    None: "🔔 <b>Прочее</b>",
+}
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+class TokenBucket:
+    """rate tokens per second, up to capacity stored"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Notification:
+    __slots__ = ("text", "parse_mode", "kind", "summary", "queued_at")
+
+    def __init__(self, text: str, parse_mode: Optional[str], kind: Optional[str], summary: Optional[str]):
+        self.text = text
+        self.parse_mode = parse_mode
+        self.kind = kind
+        self.summary = summary
+        self.queued_at = time.monotonic()
+
+    def digest_line(self) -> str:
+        if self.summary:
+            return self.summary
+        first = self.text.strip().split("\n", 1)[0]
+        plain = _TAG_RE.sub("", first) if self.parse_mode == "HTML" else first
+        return html.escape(plain)
+
+
+class _Chat:
+    __slots__ = ("chat_id", "pending", "bucket", "paused_until", "failures", "task")
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.pending: deque = deque()
+        # Negative ids are groups/channels: 20 messages per minute
+        rate = settings.NOTIFY_GROUP_RATE if int(chat_id) < 0 else settings.NOTIFY_CHAT_RATE
+        self.bucket = TokenBucket(rate)
+        self.paused_until = 0.0
+        self.failures = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+def _span(seconds: float) -> str:
+    if seconds < 90:
+        return "за последнюю минуту"
+    return f"за последние {round(seconds / 60)} мин"
+
+
+def build_digest(items: List[Notification]) -> str:
+    """One HTML message for a burst, grouped by kind, cut to the Telegram limit"""
+    span = _span(time.monotonic() - items[0].queued_at)
+    groups: Dict[Optional[str], List[Notification]] = {}
+    for item in items:
+        groups.setdefault(item.kind if item.kind in DIGEST_TITLES else None, []).append(item)
+
+    text = f"📦 <b>{len(items)} уведомлений {span}</b>\n"
+    left = len(items)
+    for kind, title in DIGEST_TITLES.items():
+        group = groups.get(kind)
+        if not group:
+            continue
+        section = f"\n{title}: {len(group)}\n"
+        if len(text) + len(section) > MAX_MESSAGE_LENGTH - DIGEST_RESERVE:
+            break
+        text += section
+        for item in group:
+            line = f"• {item.digest_line()}\n"
+            if len(text) + len(line) > MAX_MESSAGE_LENGTH - DIGEST_RESERVE:
+                break
+            text += line
+            left -= 1
+    if left:
+        text += f"\n… и ещё {left} (подробности в админ-панели)"
+    return text
+
+
+class NotificationDispatcher:
+
+    def __init__(self, send: Callable[[int, str, Optional[str]], Awaitable]):
+        self._send = send
+        self._chats: Dict[int, _Chat] = {}
+        self._global = TokenBucket(settings.NOTIFY_GLOBAL_RATE, settings.NOTIFY_GLOBAL_RATE)
+        self.counters = {
+            "queued": 0,
+            "sent": 0,
+            "digests": 0,
+            "coalesced": 0,
+            "retry_after": 0,
+            "dropped": 0,
+        }
+
+    def submit(self, chat_id: int, text: str, parse_mode: Optional[str] = "HTML",
+               kind: str = None, summary: str = None) -> None:
+        """Queue a message for chat_id; delivery happens in the background"""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(chat_id)
+        if len(chat.pending) >= settings.NOTIFY_MAX_PENDING:
+            chat.pending.popleft()
+            self.counters["dropped"] += 1
+            logger.error(f"Notification backlog for chat {chat_id} is full, oldest message dropped")
+        chat.pending.append(Notification(text, parse_mode, kind, summary))
+        self.counters["queued"] += 1
+        if chat.task is None:
+            chat.task = asyncio.create_task(self._drain(chat), name=f"notify-{chat_id}")
+
+    async def _drain(self, chat: _Chat) -> None:
+        try:
+            while chat.pending:
+                wait = chat.paused_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await chat.bucket.acquire()
+                await self._global.acquire()
+
+                # Take what is waiting right now; a burst becomes one digest
+                if len(chat.pending) >= settings.NOTIFY_DIGEST_THRESHOLD:
+                    batch = list(chat.pending)
+                    text, parse_mode = build_digest(batch), "HTML"
+                else:
+                    batch = [chat.pending[0]]
+                    text, parse_mode = batch[0].text, batch[0].parse_mode
+
+                if await self._deliver(chat, text, parse_mode, len(batch)):
+                    # submit() may have trimmed the head meanwhile, match by identity
+                    sent = set(map(id, batch))
+                    while chat.pending and id(chat.pending[0]) in sent:
+                        chat.pending.popleft()
+        finally:
+            chat.task = None
+
+    async def _deliver(self, chat: _Chat, text: str, parse_mode: Optional[str], count: int) -> bool:
+        """True when the batch is done with (sent or permanently rejected)"""
+        try:
+            await self._send(chat.chat_id, text, parse_mode)
+        except TelegramRetryAfter as e:
+            self.counters["retry_after"] += 1
+            chat.paused_until = time.monotonic() + e.retry_after
+            logger.warning(f"Telegram flood control for chat {chat.chat_id}: retry after {e.retry_after}s")
+            return False
+        except (TelegramBadRequest, TelegramForbiddenError) as e:
+            self.counters["dropped"] += count
+            logger.error(f"Notification to chat {chat.chat_id} rejected, {count} message(s) dropped: {e}")
+            return True
+        except Exception as e:
+            chat.failures += 1
+            if chat.failures > settings.NOTIFY_MAX_RETRIES:
+                chat.failures = 0
+                self.counters["dropped"] += count
+                logger.error(f"Notification to chat {chat.chat_id} failed, {count} message(s) dropped: {e}")
+                return True
+            delay = min(60, 2 ** chat.failures)
+            chat.paused_until = time.monotonic() + delay
+            logger.warning(f"Notification to chat {chat.chat_id} failed ({e}), retry in {delay}s")
+            return False
+
+        chat.failures = 0
+        self.counters["sent"] += 1
+        if count > 1:
+            self.counters["digests"] += 1
+            self.counters["coalesced"] += count
+        return True
+
+    async def stop(self, timeout: float = None) -> None:
+        """Give queued messages a chance to go out on shutdown"""
+        tasks = [chat.task for chat in self._chats.values() if chat.task]
+        if not tasks:
+            return
+        timeout = settings.NOTIFY_DRAIN_TIMEOUT if timeout is None else timeout
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        lost = sum(len(chat.pending) for chat in self._chats.values())
+        if lost:
+            self.counters["dropped"] += lost
+            logger.warning(f"Notification dispatcher stopped, {lost} message(s) not delivered")
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "pending": sum(len(chat.pending) for chat in self._chats.values()),
+            "paused_for": round(max([0.0] + [chat.paused_until - now for chat in self._chats.values()]), 1),
+            **self.counters,
+        }
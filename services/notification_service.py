@@ -1,5 +1,7 @@
 from aiogram import Bot
 from core.config import settings
+from services.notification_dispatcher import NotificationDispatcher
+import html
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,17 +9,33 @@ logger = logging.getLogger(__name__)
 class NotificationService:
     def __init__(self, bot: Bot = None):
         self.bot = bot
+        self.dispatcher = NotificationDispatcher(self._send)
 
     def set_bot(self, bot: Bot):
         """Set bot instance for sending notifications"""
         self.bot = bot
 
+    @property
+    def configured(self) -> bool:
+        """Bot and manager chat are set: notify_manager can queue anything"""
+        return bool(self.bot and settings.MANAGER_CHAT_ID)
+
     def get_bot_instance(self):
         """Get bot instance"""
         return self.bot
 
-    async def notify_manager(self, text: str, parse_mode: str = "HTML") -> bool:
-        """Send message to manager chat"""
+    async def _send(self, chat_id: int, text: str, parse_mode: str = None):
+        await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+
+    async def notify_manager(self, text: str, parse_mode: str = "HTML",
+                             kind: str = None, summary: str = None) -> bool:
+        """
+        Queue message to manager chat. True means queued, not sent: the
+        dispatcher owns delivery and its retries (flood control, backoff,
+        drop after NOTIFY_MAX_RETRIES, counted in get_stats), so callers
+        must not retry on top of it. kind/summary are used when a burst is
+        sent as a digest.
+        """
         if not self.bot:
             logger.warning("NotificationService: Bot instance not set")
             return False
@@ -26,16 +44,14 @@ class NotificationService:
             logger.warning("NotificationService: MANAGER_CHAT_ID not set")
             return False
             
-        try:
-            await self.bot.send_message(
-                chat_id=settings.MANAGER_CHAT_ID,
-                text=text,
-                parse_mode=parse_mode
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send notification to manager: {e}")
-            return False
+        self.dispatcher.submit(int(settings.MANAGER_CHAT_ID), text, parse_mode, kind, summary)
+        return True
+
+    async def stop(self):
+        await self.dispatcher.stop()
+
+    def get_stats(self) -> dict:
+        return self.dispatcher.get_stats()
 
     async def notify_new_lead(self, name: str, contact: str, message: str = None, 
                               result_type: str = None, source: str = "Bot", 
@@ -58,7 +74,8 @@ class NotificationService:
             id_str = f"(ID: <code>{user_id}</code>)" if user_id else ""
             text += f"\n\n_От:_ {user_str} {id_str}"
 
-        return await self.notify_manager(text)
+        summary = f"{html.escape(str(name))}, {html.escape(str(contact))} ({source})"
+        return await self.notify_manager(text, kind="lead", summary=summary)
 
     async def notify_test_result(self, result_type: str, answers: dict = None, 
                                  contact: dict = None, user_id: int = None, 
@@ -91,5 +108,7 @@ class NotificationService:
         
         if user_id:
             text += f"\n🆔 ID: <code>{user_id}</code>"
-            
-        return await self.notify_manager(text)
+
+        who = html.escape(str(contact.get('name') or user_id or "—")) if contact else (user_id or "—")
+        summary = f"{type_emoji} {type_name} — {who} ({product_name})"
+        return await self.notify_manager(text, kind="test", summary=summary)
@@ -0,0 +1,76 @@
+from repositories.sheets_export_repository import SheetsExportRepository
+from repositories.user_repository import UserRepository
+from repositories.test_repository import TestRepository
+from core.config import settings
+from core.google_sheets import send_bulk, build_lead_row, build_test_row
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Row cap of the legacy full export
+FULL_EXPORT_LIMIT = 10000
+
+
+def lead_export_ts(row: dict) -> Optional[datetime]:
+    """Lead position for the delta: legacy rows may have no updated_at"""
+    return row['updated_at'] or row['created_at']
+
+
+class SheetsExportService:
+    """
+    Admin "export to Google Sheets": full re-send or delta after the
+    (timestamp, id) mark of the last successful export. SHEETS_DELTA_OVERLAP
+    moves the mark back that many seconds to also catch rows committed
+    after the mark passed their timestamp; the Apps Script upserts by
+    User ID, so re-sending them is harmless.
+    """
+
+    def __init__(self, export_repo: SheetsExportRepository, user_repo: UserRepository,
+                 test_repo: TestRepository):
+        self.export_repo = export_repo
+        self.user_repo = user_repo
+        self.test_repo = test_repo
+
+    async def _after(self, destination: str):
+        """(ts, id) to continue after, None when nothing was exported yet"""
+        mark = await self.export_repo.get_mark(destination)
+        if not mark:
+            return None
+        return mark['last_ts'] - timedelta(seconds=settings.SHEETS_DELTA_OVERLAP), mark['last_id']
+
+    async def _ship(self, destination: str, rows: list, payload: list,
+                    ts_of: Callable[[dict], Optional[datetime]], id_key: str, complete: bool = True) -> int:
+        sent = await send_bulk(payload) if payload else 0
+        # Move the mark only when everything went out, otherwise the next run retries;
+        # a capped full export did not see every row and leaves the mark alone
+        marked = [r for r in rows if ts_of(r) is not None]
+        if complete and marked and sent == len(rows):
+            last = max(marked, key=lambda r: (ts_of(r), r[id_key]))
+            await self.export_repo.save_mark(destination, ts_of(last), last[id_key], sent)
+        return sent
+
+    async def export_leads(self, mode: str = "full") -> dict:
+        if mode == "delta":
+            after = await self._after("leads")
+            rows = await self.export_repo.get_leads_after(after)
+        else:
+            after = None
+            rows = await self.user_repo.get_all_leads_full(limit=FULL_EXPORT_LIMIT)
+        sent = await self._ship("leads", rows, [build_lead_row(r) for r in rows],
+                                lead_export_ts, "user_id", mode == "delta" or len(rows) < FULL_EXPORT_LIMIT)
+        logger.info(f"Leads export ({mode}): {sent}/{len(rows)} rows")
+        return {"mode": mode, "count": sent, "total": len(rows), "since": after[0].isoformat() if after else None}
+
+    async def export_tests(self, mode: str = "full") -> dict:
+        if mode == "delta":
+            after = await self._after("tests")
+            rows = await self.export_repo.get_tests_after(after)
+        else:
+            after = None
+            rows = await self.test_repo.get_all_tests_full(limit=FULL_EXPORT_LIMIT)
+        sent = await self._ship("tests", rows, [build_test_row(r) for r in rows],
+                                lambda r: r['created_at'], "id", mode == "delta" or len(rows) < FULL_EXPORT_LIMIT)
+        logger.info(f"Tests export ({mode}): {sent}/{len(rows)} rows")
+        return {"mode": mode, "count": sent, "total": len(rows), "since": after[0].isoformat() if after else None}
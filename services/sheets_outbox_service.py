@@ -0,0 +1,106 @@
+from repositories.outbox_repository import OutboxRepository
+from core.config import settings
+from core.google_sheets import send_to_sheets
+from typing import List, Optional
+import asyncio
+import random
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Claimed rows stay invisible to other workers for this long
+LEASE_SECONDS = 60
+
+
+class SheetsOutboxService:
+    """Background worker draining sheets_outbox into the Sheets webhook"""
+
+    def __init__(self, outbox_repo: OutboxRepository):
+        self.outbox_repo = outbox_repo
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self.sent = 0
+        self.failed_batches = 0
+        self.last_error: Optional[str] = None
+        self.last_sent_at: Optional[float] = None
+
+    def start(self) -> None:
+        if self._task is None and settings.GOOGLE_SHEETS_ENABLED:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run(), name="sheets-outbox")
+            logger.info("Sheets outbox worker started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+        logger.info("Sheets outbox worker stopped")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.flush()
+            except Exception as e:
+                logger.error(f"Sheets outbox worker error: {e}")
+                claimed = 0
+
+            # A full batch means more is waiting: go on without sleeping
+            if claimed < settings.SHEETS_OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), settings.SHEETS_OUTBOX_FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def flush(self) -> int:
+        """Send one batch of due rows, return how many were claimed"""
+        rows = await self.outbox_repo.claim(settings.SHEETS_OUTBOX_BATCH_SIZE, LEASE_SECONDS)
+        if not rows:
+            return 0
+
+        # The Apps Script picks the sheet from the first item: one request per type
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row['payload'].get('type'), []).append(row)
+
+        for group in by_type.values():
+            await self._send(group)
+        return len(rows)
+
+    async def _send(self, rows: List[dict]) -> None:
+        ids = [r['id'] for r in rows]
+        if await send_to_sheets([r['payload'] for r in rows]):
+            await self.outbox_repo.complete(ids)
+            self.sent += len(ids)
+            self.last_sent_at = time.time()
+            return
+
+        attempts = max(r['attempts'] for r in rows)
+        delay = min(settings.SHEETS_OUTBOX_BACKOFF_MAX,
+                    settings.SHEETS_OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+        delay *= random.uniform(0.8, 1.2)
+        self.failed_batches += 1
+        self.last_error = f"webhook failed ({len(ids)} rows, attempt {attempts})"
+        await self.outbox_repo.retry(ids, delay, self.last_error)
+        logger.warning(f"Sheets outbox: {self.last_error}, retry in {delay:.0f}s")
+
+    async def get_stats(self) -> dict:
+        """Queue depth/lag from the table plus this worker's counters"""
+        stats = await self.outbox_repo.get_stats()
+        stats.update({
+            "running": self.running,
+            "sent": self.sent,
+            "failed_batches": self.failed_batches,
+            "last_error": self.last_error,
+            "last_sent_ago": round(time.time() - self.last_sent_at) if self.last_sent_at else None,
+        })
+        return stats
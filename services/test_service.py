@@ -10,8 +10,8 @@ class TestService:
     def __init__(self, test_repo: TestRepository):
         self.test_repo = test_repo
 
-    async def process_teremok_test(self, user_id: int, answers: dict) -> int:
-        """Calculate and save Teremok test result"""
+    async def process_teremok_test(self, user_id: int, answers: dict, export: bool = False) -> TestResult:
+        """Calculate and save Teremok test result, return it with its id"""
         result_data = calculate_result(answers)
         
         result = TestResult(
@@ -22,9 +22,10 @@ class TestService:
             product="teremok"
         )
         
-        return await self.test_repo.save_test_result(result)
+        result.id = await self.test_repo.save_test_result(result, export)
+        return result
 
-    async def process_formula_rsp(self, user_id: int, answers: list) -> FormulaResult:
+    async def process_formula_rsp(self, user_id: int, answers: list, export: bool = False) -> FormulaResult:
         """Calculate and save Formula RSP result"""
         # Calculate
         computed = compute_formula_rsp(answers)
@@ -39,7 +40,7 @@ class TestService:
         )
         
         # Save
-        result_id = await self.test_repo.save_formula_result(result)
+        result_id = await self.test_repo.save_formula_result(result, export)
         result.id = result_id
         computed.id = result_id
         
@@ -51,5 +52,26 @@ class TestService:
                                   sort_by: str = "created_at", sort_order: str = "desc") -> list:
         return await self.test_repo.get_all_tests_full(limit, product, result_type, days, sort_by, sort_order)
 
+    async def get_tests_page(self, limit: int = 50, product: str = None,
+                             result_type: str = None, days: int = None,
+                             sort_by: str = "created_at", sort_order: str = "desc",
+                             cursor: str = None, score_type: str = None,
+                             min_score: float = None) -> dict:
+        return await self.test_repo.get_tests_page(limit, product, result_type, days, sort_by, sort_order,
+                                                   cursor, score_type, min_score)
+
+    def iter_tests(self, product: str = None, result_type: str = None, days: int = None,
+                   sort_by: str = "created_at", sort_order: str = "desc",
+                   score_type: str = None, min_score: float = None):
+        """Async iterator over all matching test results (for streaming exports)"""
+        return self.test_repo.iter_tests(product, result_type, days, sort_by, sort_order,
+                                         score_type, min_score)
+
+    async def get_formula_result(self, result_id: int) -> FormulaResult | None:
+        return await self.test_repo.get_formula_result_by_id(result_id)
+
+    async def get_results_by_ids(self, teremok_ids: list, formula_ids: list) -> list:
+        return await self.test_repo.get_results_by_ids(teremok_ids, formula_ids)
+
     async def get_recent_tests_full(self, limit: int = 10) -> list:
         return await self.test_repo.get_recent_tests_full(limit)
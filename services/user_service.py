@@ -1,6 +1,7 @@
 from repositories.user_repository import UserRepository
 from models.user import UserContact
 from core.config import settings
+from core.ttl_cache import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,23 +9,32 @@ logger = logging.getLogger(__name__)
 class UserService:
     def __init__(self, user_repo: UserRepository):
         self.user_repo = user_repo
+        # user_id -> has contact (hot path of /api/check-subscription)
+        self.contact_cache = TTLCache(
+            settings.USER_CACHE_MAXSIZE,
+            settings.CONTACT_CACHE_TTL,
+            settings.CONTACT_CACHE_NEGATIVE_TTL,
+        )
 
-    async def register_contact(self, contact: UserContact) -> None:
-        """Register or update user contact info"""
-        await self.user_repo.save_contact(contact)
+    async def register_contact(self, contact: UserContact, export: bool = False) -> None:
+        """Register or update user contact info (export=True: queue for Google Sheets)"""
+        await self.user_repo.save_contact(contact, export)
+        self.contact_cache.invalidate(contact.user_id)
+        self.contact_cache.set(contact.user_id, True)
         
     async def get_contact(self, user_id: int) -> UserContact | None:
         return await self.user_repo.get_contact(user_id)
 
     async def has_contact(self, user_id: int) -> bool:
-        return await self.user_repo.has_contact(user_id)
+        return await self.contact_cache.get_or_load(user_id, lambda: self.user_repo.has_contact(user_id))
 
     async def submit_lead(self, name: str, contact: str, message: str) -> None:
         # Leads logic for legacy form
         await self.user_repo.save_lead(0, f"{name} | {contact}", message)
 
-    async def update_lead_status(self, user_id: int, status: str, notes: str = None) -> None:
-        await self.user_repo.update_status(user_id, status, notes)
+    async def update_lead_status(self, user_id: int, status: str, notes: str = None,
+                                 export: bool = False) -> None:
+        await self.user_repo.update_status(user_id, status, notes, export)
 
     # Telegram Admin Management
     async def add_admin(self, user_id: int, username: str, role: str = 'admin', added_by: int = 0) -> None:
@@ -45,14 +55,28 @@ class UserService:
     async def get_statistics(self, days: int = None) -> dict:
         return await self.user_repo.get_statistics(days)
 
-    async def get_daily_statistics(self, days: int = 7) -> dict:
-        return await self.user_repo.get_daily_statistics(days)
+    async def get_daily_statistics(self, days: int = 7, bucket: str = "day") -> dict:
+        return await self.user_repo.get_daily_statistics(days, bucket)
 
     async def get_all_leads_full(self, limit: int = 100, status: str = None,
                                   search: str = None, days: int = None,
                                   sort_by: str = "created_at", sort_order: str = "desc") -> list:
         return await self.user_repo.get_all_leads_full(limit, status, search, days, sort_by, sort_order)
 
+    async def get_leads_page(self, limit: int = 50, status: str = None,
+                             search: str = None, days: int = None,
+                             sort_by: str = "created_at", sort_order: str = "desc",
+                             cursor: str = None) -> dict:
+        return await self.user_repo.get_leads_page(limit, status, search, days, sort_by, sort_order, cursor)
+
+    def iter_leads(self, status: str = None, search: str = None, days: int = None,
+                   sort_by: str = "created_at", sort_order: str = "desc"):
+        """Async iterator over all matching leads (for streaming exports)"""
+        return self.user_repo.iter_leads(status, search, days, sort_by, sort_order)
+
+    async def search_leads(self, query: str, limit: int = 10) -> list:
+        return await self.user_repo.search_leads(query, limit)
+
     async def get_recent_leads_full(self, limit: int = 10) -> list:
         return await self.user_repo.get_recent_leads_full(limit)
 
@@ -3,11 +3,17 @@ Web Admin Panel Routes
 Protected by ADMIN_PANEL_SECRET
 """
 from fastapi import APIRouter, Request, Depends, HTTPException, Form
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse, FileResponse
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from datetime import datetime
 from core.config import settings
 from core.texts import TYPES_DATA
+from core.db_pool import get_pool_stats
+from core import table_export
+from core.telegram_checks import subscription_cache
+from web.page_cache import result_pages
+from bot.webhook import telegram_webhook
 from repositories.user_repository import UserRepository
 from services.auth_service import AuthService
 from services.user_service import UserService
@@ -16,7 +22,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from core.dependencies import user_repo, auth_service, user_service, test_service
+from core.dependencies import (user_repo, stats_repo, auth_service, user_service, test_service,
+                               sheets_outbox_service, sheets_export_service, task_queue,
+                               notification_service)
 
 logger = logging.getLogger(__name__)
 
@@ -112,12 +120,25 @@ async def login_page(request: Request):
 @router.post("/login")
 async def login_submit(request: Request, username: str = Form(...), password: str = Form(...)):
     """Handle login submission"""
-    if await auth_service.verify_password(username, password):
+    ip = request.client.host if request.client else None
+    retry_after = auth_service.login_retry_after(username, ip)
+    if retry_after:
+        return templates.TemplateResponse("admin/login.html", {
+            "request": request,
+            "error": f"Слишком много неудачных попыток. Повторите через {int(retry_after // 60) + 1} мин."
+        }, status_code=429, headers={"Retry-After": str(int(retry_after) + 1)})
+
+    if await auth_service.verify_password(username, password, ip):
         # Create session
-        token = await auth_service.create_session(username)
+        token = await auth_service.create_session(
+            username,
+            user_agent=request.headers.get("user-agent"),
+            ip=ip
+        )
         
         response = RedirectResponse(url="/app/admin/dashboard", status_code=303)
-        response.set_cookie("admin_session", token, max_age=86400*7, httponly=True, samesite="lax")
+        response.set_cookie("admin_session", token, max_age=settings.ADMIN_SESSION_TTL,
+                            httponly=True, samesite="lax")
         return response
         
     return templates.TemplateResponse("admin/login.html", {
@@ -128,6 +149,9 @@ async def login_submit(request: Request, username: str = Form(...), password: st
 @router.get("/logout")
 async def logout(request: Request):
     """Logout"""
+    token = request.cookies.get("admin_session")
+    if token:
+        await auth_service.revoke_session(token)
     response = RedirectResponse(url="/app/admin/login", status_code=303)
     response.delete_cookie("admin_session")
     response.delete_cookie("admin_key")
@@ -146,9 +170,19 @@ def serialize_record(record):
             data[key] = value.strftime("%Y-%m-%d %H:%M:%S")
     return data
 
+def format_scores(scores) -> str:
+    """JSONB scores dict -> 'type: n, ...'"""
+    if isinstance(scores, dict):
+        return ", ".join([f"{k}: {v}" for k, v in scores.items()])
+    return str(scores or "")
+
+CHART_RANGES = (7, 30, 90, 365)
+CHART_BUCKETS = ("hour", "day", "week", "month")
+
 @router.get("")
 @router.get("/dashboard")
-async def admin_dashboard(request: Request, key: str = None):
+async def admin_dashboard(request: Request, key: str = None,
+                          chart_days: int = 7, chart_bucket: str = "day"):
     # ... (auth check)
     try:
         if not await verify_admin_auth(request):
@@ -158,7 +192,11 @@ async def admin_dashboard(request: Request, key: str = None):
         
         # Get stats
         stats = await user_service.get_statistics()
-        daily_stats = await user_service.get_daily_statistics()
+        if chart_days not in CHART_RANGES:
+            chart_days = 7
+        if chart_bucket not in CHART_BUCKETS:
+            chart_bucket = "day"
+        daily_stats = await user_service.get_daily_statistics(chart_days, chart_bucket)
         
         # Get recent activity
         recent_leads = await user_service.get_recent_leads_full(limit=5)
@@ -187,6 +225,8 @@ async def admin_dashboard(request: Request, key: str = None):
             "chart_labels": daily_stats['labels'],
             "chart_leads": daily_stats['leads'],
             "chart_tests": daily_stats['tests'],
+            "chart_days": chart_days,
+            "chart_bucket": chart_bucket,
             "key": key or request.query_params.get("key") or request.cookies.get("admin_key")
         })
     except Exception as e:
@@ -198,6 +238,8 @@ async def admin_dashboard(request: Request, key: str = None):
     return response
 
 # ... LEADS ...
+PAGE_SIZE = 50
+
 @router.get("/leads")
 async def admin_leads(request: Request, 
                       status: str = "all",
@@ -205,6 +247,7 @@ async def admin_leads(request: Request,
                       days: str = None,
                       sort_by: str = "created_at",
                       sort_order: str = "desc",
+                      cursor: str = None,
                       key: str = None):
     """Leads management page"""
     if not await verify_admin_auth(request):
@@ -215,17 +258,18 @@ async def admin_leads(request: Request,
     # Safely parse days
     days_val = int(days) if days and days.isdigit() else None
 
-    leads = await user_service.get_all_leads_full(
-        limit=200,
+    page = await user_service.get_leads_page(
+        limit=PAGE_SIZE,
         status=status if status != "all" else None,
         search=search if search else None,
         days=days_val,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        cursor=cursor
     )
     
     # Serialize
-    leads = [serialize_record(l) for l in leads]
+    leads = [serialize_record(l) for l in page["items"]]
     
     return templates.TemplateResponse("admin/leads.html", {
         "request": request,
@@ -235,6 +279,8 @@ async def admin_leads(request: Request,
         "current_days": days,
         "current_sort_by": sort_by,
         "current_sort_order": sort_order,
+        "current_cursor": cursor,
+        "next_cursor": page["next_cursor"],
         "key": key or request.query_params.get("key") or request.cookies.get("admin_key")
     })
 
@@ -246,6 +292,9 @@ async def admin_tests(request: Request,
                       days: str = None,
                       sort_by: str = "created_at",
                       sort_order: str = "desc",
+                      cursor: str = None,
+                      score_type: str = "",
+                      min_score: str = None,
                       key: str = None):
     """Test results management page"""
     if not await verify_admin_auth(request):
@@ -255,20 +304,27 @@ async def admin_tests(request: Request,
     
     # Safely parse days
     days_val = int(days) if days and days.isdigit() else None
+    min_score_val = int(min_score) if min_score and min_score.isdigit() else None
+    if score_type not in TYPES_DATA:
+        score_type = ""
 
-    tests = await test_service.get_all_tests_full(
-        limit=200,
+    page = await test_service.get_tests_page(
+        limit=PAGE_SIZE,
         product=product if product != "all" else None,
         result_type=result_type if result_type != "all" else None,
         days=days_val,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        cursor=cursor,
+        score_type=score_type or None,
+        min_score=min_score_val
     )
     
     # Add type info and serialize
     tests_enriched = []
-    for t in tests:
+    for t in page["items"]:
         test_dict = serialize_record(t)
+        test_dict['scores_pretty'] = format_scores(test_dict.get('scores'))
         type_info = TYPES_DATA.get(test_dict.get('result_type'))
         if type_info:
             test_dict['type_emoji'] = type_info.emoji
@@ -286,8 +342,12 @@ async def admin_tests(request: Request,
         "current_product": product,
         "current_type": result_type,
         "current_days": days,
+        "current_score_type": score_type,
+        "current_min_score": min_score_val,
         "current_sort_by": sort_by,
         "current_sort_order": sort_order,
+        "current_cursor": cursor,
+        "next_cursor": page["next_cursor"],
         "key": key or request.query_params.get("key") or request.cookies.get("admin_key")
     })
 # ... REST OF FILE ...
@@ -312,6 +372,16 @@ async def admin_settings(request: Request, key: str = None):
     return templates.TemplateResponse("admin/settings.html", {
         "request": request,
         "config": config,
+        "db_pool": get_pool_stats(),
+        "sheets_outbox": await sheets_outbox_service.get_stats(),
+        "task_queue": task_queue.get_stats(),
+        "notifications": notification_service.get_stats(),
+        "webhook": telegram_webhook.get_stats(),
+        "result_pages": result_pages.get_stats(),
+        "user_caches": {
+            "subscription": subscription_cache.get_stats(),
+            "contact": user_service.contact_cache.get_stats(),
+        },
         "key": key or request.query_params.get("key") or request.cookies.get("admin_key")
     })
 
@@ -327,14 +397,44 @@ async def update_lead_status(request: Request, user_id: int):
     status = data.get("status", "new")
     notes = data.get("notes")
     
-    await user_service.update_lead_status(user_id, status, notes)
+    await user_service.update_lead_status(user_id, status, notes, export=True)
     logger.info(f"Lead {user_id} status updated to {status}")
     
     return JSONResponse({"status": "ok"})
 
+@router.get("/api/leads/search")
+async def search_leads(request: Request, q: str = "", limit: int = 10):
+    """Typeahead search over leads (ranked)"""
+    if not await verify_admin_auth(request):
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
+    
+    q = q.strip()
+    if len(q) < 2:
+        return JSONResponse({"results": []})
+    
+    try:
+        leads = await user_service.search_leads(q, limit=max(1, min(limit, 50)))
+        return JSONResponse({"results": [serialize_record(l) for l in leads]})
+    except Exception as e:
+        logger.error(f"Lead search failed: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@router.post("/api/stats/rebuild")
+async def rebuild_stats(request: Request):
+    """Recompute the daily_stats rollup from raw tables"""
+    if not await verify_admin_auth(request):
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
+    
+    try:
+        count = await stats_repo.rebuild()
+        return JSONResponse({"status": "ok", "rows": count})
+    except Exception as e:
+        logger.error(f"Rebuild stats failed: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
 @router.post("/api/export/leads")
-async def export_leads_to_sheets(request: Request):
-    """Export all leads to Google Sheets"""
+async def export_leads_to_sheets(request: Request, mode: str = "full"):
+    """Export leads to Google Sheets: mode=full (all) or mode=delta (changed since last export)"""
     if not await verify_admin_auth(request):
         return JSONResponse({"error": "Unauthorized"}, status_code=403)
     
@@ -342,45 +442,15 @@ async def export_leads_to_sheets(request: Request):
         return JSONResponse({"error": "Google Sheets интеграция отключена"}, status_code=400)
     
     try:
-        from core.google_sheets import send_to_sheets
-        
-        leads = await user_service.get_all_leads_full(limit=10000)
-        # Convert to dicts
-        leads = [dict(l) for l in leads]
-        
-        # Prepare all data first
-        all_data = []
-        for lead in leads:
-            all_data.append({
-                "type": "lead",
-                "name": lead.get("name", ""),
-                "role": lead.get("role", ""),
-                "company": lead.get("company", ""),
-                "phone": lead.get("phone", ""),
-                "telegram": lead.get("telegram_username", ""),
-                "team_size": lead.get("team_size", ""),
-                "user_id": str(lead.get("user_id", "")),
-                "status": lead.get("status", "new")
-            })
-            
-        # Send in batches of 50
-        BATCH_SIZE = 50
-        sent_count = 0
-        
-        for i in range(0, len(all_data), BATCH_SIZE):
-            batch = all_data[i:i + BATCH_SIZE]
-            if await send_to_sheets(batch):
-                sent_count += len(batch)
-        
-        logger.info(f"Full leads export completed: {sent_count}/{len(leads)} leads")
-        return JSONResponse({"status": "ok", "count": sent_count})
+        result = await sheets_export_service.export_leads("delta" if mode == "delta" else "full")
+        return JSONResponse({"status": "ok", **result})
     except Exception as e:
         logger.error(f"Export leads failed: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
 @router.post("/api/export/tests")
-async def export_tests_to_sheets(request: Request):
-    """Export all tests to Google Sheets"""
+async def export_tests_to_sheets(request: Request, mode: str = "full"):
+    """Export tests to Google Sheets: mode=full (all) or mode=delta (new since last export)"""
     if not await verify_admin_auth(request):
         return JSONResponse({"error": "Unauthorized"}, status_code=403)
     
@@ -388,49 +458,79 @@ async def export_tests_to_sheets(request: Request):
         return JSONResponse({"error": "Google Sheets интеграция отключена"}, status_code=400)
     
     try:
-        from core.google_sheets import send_to_sheets
-        import json
-        
-        tests = await test_service.get_all_tests_full(limit=10000)
-        # Convert to dicts
-        tests = [dict(t) for t in tests]
-        
-        all_data = []
-        for test in tests:
-            # Parse scores
-            scores_str = ""
-            if test.get("scores"):
-                try:
-                    scores = test["scores"]
-                    if isinstance(scores, str):
-                        scores = json.loads(scores)
-                    scores_str = ", ".join([f"{k}: {v}" for k, v in scores.items()])
-                except:
-                    scores_str = str(test.get("scores", ""))
-
-            all_data.append({
-                "type": "test",
-                "name": test.get("name", ""),
-                "role": test.get("role", ""),
-                "company": test.get("company", ""),
-                "phone": test.get("phone", ""),
-                "result_type": test.get("result_type", ""),
-                "scores": scores_str,
-                "product": test.get("product", "teremok"),
-                "user_id": str(test.get("user_id", ""))
-            })
-            
-        # Send in batches
-        BATCH_SIZE = 50
-        sent_count = 0
-        
-        for i in range(0, len(all_data), BATCH_SIZE):
-            batch = all_data[i:i + BATCH_SIZE]
-            if await send_to_sheets(batch):
-                sent_count += len(batch)
-        
-        logger.info(f"Full tests export completed: {sent_count}/{len(tests)} tests")
-        return JSONResponse({"status": "ok", "count": sent_count})
+        result = await sheets_export_service.export_tests("delta" if mode == "delta" else "full")
+        return JSONResponse({"status": "ok", **result})
     except Exception as e:
         logger.error(f"Export tests failed: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+async def stream_table(rows, columns, name: str, fmt: str):
+    """Rows as a streamed CSV, or as an XLSX built in a temporary file"""
+    filename = f"{name}_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if fmt == "xlsx":
+        path = await table_export.build_xlsx(rows, columns, name)
+        # The background task runs after the response, sent in full or not
+        return FileResponse(path, media_type=XLSX_MEDIA_TYPE, headers=headers,
+                            background=BackgroundTask(table_export.remove_file, path))
+    return StreamingResponse(table_export.stream_csv(rows, columns),
+                             media_type="text/csv; charset=utf-8", headers=headers)
+
+@router.get("/api/export/leads.{fmt}")
+async def download_leads(request: Request, fmt: str,
+                         status: str = "all",
+                         search: str = "",
+                         days: str = None,
+                         sort_by: str = "created_at",
+                         sort_order: str = "desc"):
+    """Download leads (same filters as the leads page, no row cap)"""
+    if not await verify_admin_auth(request):
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
+    if fmt not in ("csv", "xlsx"):
+        return JSONResponse({"error": "Unknown format"}, status_code=404)
+    if fmt == "xlsx" and not table_export.xlsx_available():
+        return JSONResponse({"error": "XLSX export requires openpyxl"}, status_code=501)
+    
+    days_val = int(days) if days and days.isdigit() else None
+    rows = user_service.iter_leads(
+        status=status if status != "all" else None,
+        search=search if search else None,
+        days=days_val,
+        sort_by=sort_by,
+        sort_order=sort_order
+    )
+    return await stream_table(rows, table_export.LEAD_COLUMNS, "leads", fmt)
+
+@router.get("/api/export/tests.{fmt}")
+async def download_tests(request: Request, fmt: str,
+                         product: str = "all",
+                         result_type: str = "all",
+                         days: str = None,
+                         sort_by: str = "created_at",
+                         sort_order: str = "desc",
+                         score_type: str = "",
+                         min_score: str = None):
+    """Download test results (same filters as the tests page, no row cap)"""
+    if not await verify_admin_auth(request):
+        return JSONResponse({"error": "Unauthorized"}, status_code=403)
+    if fmt not in ("csv", "xlsx"):
+        return JSONResponse({"error": "Unknown format"}, status_code=404)
+    if fmt == "xlsx" and not table_export.xlsx_available():
+        return JSONResponse({"error": "XLSX export requires openpyxl"}, status_code=501)
+    
+    days_val = int(days) if days and days.isdigit() else None
+    min_score_val = int(min_score) if min_score and min_score.isdigit() else None
+    if score_type not in TYPES_DATA:
+        score_type = ""
+    rows = test_service.iter_tests(
+        product=product if product != "all" else None,
+        result_type=result_type if result_type != "all" else None,
+        days=days_val,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        score_type=score_type or None,
+        min_score=min_score_val
+    )
+    return await stream_table(rows, table_export.TEST_COLUMNS, "tests", fmt)
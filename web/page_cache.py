@@ -0,0 +1,110 @@
+"""
+LRU cache of rendered HTML for pages whose data never changes once
+created (test result pages, keyed by result id). Bounded by entry count
+and by total bytes. The markup still changes with deploys, so entries and
+ETags carry RENDER_VERSION (a hash of the templates) and responses use a
+short max-age: browsers and proxies revalidate and get a cheap 304 until
+the page really changes.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+
+from core.config import settings
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+
+def _render_version() -> str:
+    """Hash of every template file: a template fix gets new keys and ETags"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(TEMPLATES_DIR):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, TEMPLATES_DIR).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:8]
+
+
+RENDER_VERSION = _render_version()
+
+
+class CachedPage:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        # Body hash also covers text / data changes outside the templates
+        self.etag = f'"{RENDER_VERSION}-{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class PageCache:
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._pages: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self._bytes = 0
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "not_modified": 0,
+        }
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        key = (RENDER_VERSION, key)
+        page = self._pages.get(key)
+        if page is None:
+            self.counters["misses"] += 1
+            return None
+        self._pages.move_to_end(key)
+        self.counters["hits"] += 1
+        return page
+
+    def put(self, key: Hashable, body: bytes) -> CachedPage:
+        key = (RENDER_VERSION, key)
+        page = CachedPage(body)
+        if len(body) > self.max_bytes:
+            return page
+        old = self._pages.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        self._pages[key] = page
+        self._bytes += len(body)
+        while len(self._pages) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._pages.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.counters["evictions"] += 1
+        return page
+
+    def __contains__(self, key: Hashable) -> bool:
+        return (RENDER_VERSION, key) in self._pages
+
+    def response(self, request: Request, page: CachedPage) -> Response:
+        headers = {"ETag": page.etag, "Cache-Control": f"public, max-age={settings.RESULT_PAGE_MAX_AGE}"}
+        if page.etag in request.headers.get("if-none-match", ""):
+            self.counters["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(content=page.body, headers=headers)
+
+    def get_stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "entries": len(self._pages),
+            "max_entries": self.max_entries,
+            "kbytes": round(self._bytes / 1024, 1),
+            "max_kbytes": round(self.max_bytes / 1024),
+            **self.counters,
+            "hit_rate": round(100 * self.counters["hits"] / lookups, 1) if lookups else 0.0,
+        }
+
+
+# Rendered result pages (teremok / formula), keyed by (product, id)
+result_pages = PageCache(settings.RESULT_PAGE_CACHE_ENTRIES, settings.RESULT_PAGE_CACHE_BYTES)
@@ -3,24 +3,34 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from core.texts import TYPES_DATA, get_types_for_api
-from core.database import save_lead, has_contact, get_contact, save_contact, save_test_result # Legacy imports to be replaced
+from core.formula_logic import FORMULA_QUESTIONS, FORMULA_OPTIONS
+from core.formula_rsp_questions import FORMULA_RSP_QUESTIONS
+from web.static_json import StaticJSON
+from web.page_cache import result_pages
+from core.task_queue import NO_RETRY
+from core.database import save_lead # Legacy, todo: move to repo
 from core.config import settings
-from core.telegram_checks import is_subscribed_to_required_channel
-from core.logic import calculate_result, DIAGNOSTIC_QUESTIONS
+from core.telegram_checks import is_subscribed_cached
+from core.logic import DIAGNOSTIC_QUESTIONS
+from core.db_pool import acquire, init_pool, close_pool, is_pool_ready
+from core import google_sheets
 import os
+import asyncio
 import logging
-import asyncpg
+from contextlib import asynccontextmanager
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from core.limiter import limiter
+from bot.webhook import telegram_webhook, SECRET_HEADER
 
 # Services
 from repositories.user_repository import UserRepository
-from repositories.test_repository import TestRepository
+from repositories.test_repository import TestRepository, as_json_value
 from services.user_service import UserService
 from services.test_service import TestService
 from models.user import UserContact
-from core.dependencies import user_service, test_service, user_repo, test_repo, notification_service
+from core.dependencies import (user_service, test_service, user_repo, test_repo, notification_service,
+                               sheets_outbox_service, task_queue)
 
 
 logger = logging.getLogger(__name__)
@@ -31,7 +41,34 @@ logger = logging.getLogger(__name__)
 # user_service = UserService(user_repo)
 # test_service = TestService(test_repo)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # main.main() may have created the pool already (bot + web in one process)
+    owns_pool = not is_pool_ready()
+    await init_pool()
+    await google_sheets.init_client()
+    sheets_outbox_service.start()
+    task_queue.start()
+    if telegram_webhook.enabled:
+        await telegram_webhook.startup()
+    try:
+        yield
+    finally:
+        if telegram_webhook.enabled:
+            await telegram_webhook.shutdown()
+        # Drain notifications first: they may still need the pool
+        await task_queue.stop()
+        await notification_service.stop()
+        # Bot client created by the app.web worker (not shared with a polling loop)
+        owned_bot = getattr(app.state, "owned_bot", None)
+        if owned_bot is not None:
+            await owned_bot.session.close()
+        await sheets_outbox_service.stop()
+        await google_sheets.close_client()
+        if owns_pool:
+            await close_pool()
+
+app = FastAPI(lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 router = APIRouter()
@@ -41,34 +78,92 @@ templates_path = os.path.join(os.path.dirname(__file__), "templates")
 templates = Jinja2Templates(directory=templates_path)
 
 # Bot instance for notifications
-def set_bot(bot):
+def set_bot(bot, dp=None):
+    """dp is passed in webhook mode: updates then arrive on settings.WEBHOOK_PATH"""
     notification_service.set_bot(bot)
+    if dp is not None:
+        telegram_webhook.attach(bot, dp)
+
+async def notify_test_result_task(user_id: int, result_type: str, answers, product: str,
+                                  scores: dict) -> bool:
+    """
+    Background: manager notification about a finished test. The queue's
+    retries cover the contact lookup; once the message is handed to the
+    dispatcher, delivery retries are the dispatcher's. Notifications not
+    configured (no bot / MANAGER_CHAT_ID) is a skip, not a failure to retry.
+    """
+    if not notification_service.configured:
+        return None
+    contact = await user_service.get_contact(user_id)
+    return await notification_service.notify_test_result(
+        user_id=user_id,
+        contact=contact.__dict__ if contact else None,
+        result_type=result_type,
+        answers=answers,
+        product=product,
+        scores=scores
+    )
+
+# Immutable catalogs: serialized and compressed once at import, served with ETag / 304
+def _teremok_questions_payload() -> dict:
+    questions = []
+    for q in DIAGNOSTIC_QUESTIONS:
+        questions.append({
+            "id": q.id,
+            "text": q.text,
+            "options": [{"text": opt["text"], "index": i} for i, opt in enumerate(q.options)]
+        })
+    return {"questions": questions, "total": len(questions)}
+
+def _formula_questions_payload() -> dict:
+    questions = [
+        {
+            "id": q.id,
+            "text": q.text,
+            "options": FORMULA_OPTIONS
+        }
+        for q in FORMULA_QUESTIONS
+    ]
+    return {"questions": questions, "total": len(questions)}
+
+TYPES_JSON = StaticJSON({k: v.__dict__ for k, v in TYPES_DATA.items()})
+TEREMOK_TYPES_JSON = StaticJSON({"types": get_types_for_api()})
+TEREMOK_QUESTIONS_JSON = StaticJSON(_teremok_questions_payload())
+FORMULA_QUESTIONS_JSON = StaticJSON(_formula_questions_payload())
+FORMULA_RSP_QUESTIONS_JSON = StaticJSON({"questions": FORMULA_RSP_QUESTIONS})
 
 # API Endpoint to get types (legacy, for compatibility)
 @router.get("/api/types")
-async def get_types():
-    # Convert dataclasses to dicts
-    return {k: v.__dict__ for k, v in TYPES_DATA.items()}
+async def get_types(request: Request):
+    return TYPES_JSON.response(request)
 
 # API Endpoint to get Teremok types with full info
 @router.get("/api/teremok/types")
-async def get_teremok_types():
+async def get_teremok_types(request: Request):
     """Return all Teremok types with full descriptions for UI"""
-    from core.texts import get_types_for_api
-    return {"types": get_types_for_api()}
+    return TEREMOK_TYPES_JSON.response(request)
 
 # API Endpoint to get Teremok test questions
 @router.get("/api/teremok/questions")
-async def get_teremok_questions():
+async def get_teremok_questions(request: Request):
     """Return all diagnostic questions for Teremok test"""
-    questions = []
-    for q in DIAGNOSTIC_QUESTIONS:
-        questions.append({
-            "id": q.id,
-            "text": q.text,
-            "options": [{"text": opt["text"], "index": i} for i, opt in enumerate(q.options)]
-        })
-    return {"questions": questions, "total": len(questions)}
+    return TEREMOK_QUESTIONS_JSON.response(request)
+
+# ==== Telegram webhook (BOT_MODE=webhook) ====
+@router.post(settings.WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook_update(request: Request):
+    if not telegram_webhook.enabled:
+        return JSONResponse({"error": "Webhook mode is off"}, status_code=404)
+    if not telegram_webhook.check_secret(request.headers.get(SECRET_HEADER)):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    if not await telegram_webhook.feed(data):
+        # Busy: Telegram re-delivers the update later
+        return JSONResponse({"error": "Busy"}, status_code=503, headers={"Retry-After": "1"})
+    return JSONResponse({"ok": True})
 
 # ==== NEW: Check subscription endpoint ====
 @router.get("/api/check-subscription")
@@ -89,11 +184,11 @@ async def check_subscription(user_id: int):
     if not bot_instance:
         return JSONResponse({"subscribed": False, "has_contact": False, "error": "Bot not initialized"})
     
-    # Проверяем подписку на канал
-    is_subscribed = await is_subscribed_to_required_channel(bot_instance, user_id)
-    
-    # Проверяем наличие контактов в БД
-    user_has_contact = await user_service.has_contact(user_id)
+    # Подписка (Telegram API) и контакты (БД) — параллельно, оба ответа кэшируются
+    is_subscribed, user_has_contact = await asyncio.gather(
+        is_subscribed_cached(bot_instance, user_id),
+        user_service.has_contact(user_id),
+    )
     
     return JSONResponse({
         "subscribed": is_subscribed,
@@ -137,12 +232,14 @@ async def save_user_contacts(request: Request):
             product=product
         )
         
-        # Save via service
-        await user_service.register_contact(contact)
+        # Save via service (Sheets export goes through the outbox)
+        await user_service.register_contact(contact, export=True)
         logger.info(f"Contacts saved for user {user_id}")
         
-        # Notification
-        await notification_service.notify_new_lead(
+        # Notification runs in the background task queue; Telegram retries are the dispatcher's
+        task_queue.submit(
+            "notify_new_lead", notification_service.notify_new_lead,
+            policy=NO_RETRY,
             name=data['name'],
             contact=data['phone'],
             message=f"Role: {data['role']}, Company: {data['company']}",
@@ -151,13 +248,6 @@ async def save_user_contacts(request: Request):
             user_id=data.get('user_id')
         )
         
-        # Export to Google Sheets
-        try:
-            from core.google_sheets import export_lead_to_sheets
-            await export_lead_to_sheets(contact.__dict__)
-        except Exception as e:
-            logger.error(f"Failed to export lead to sheets: {e}")
-        
         return JSONResponse({
             "status": "success", 
             "message": "Контакты сохранены"
@@ -190,41 +280,20 @@ async def submit_test_results(request: Request):
         answers = data['answers']
         
         # Process via service
-        test_id = await test_service.process_teremok_test(user_id, answers)
+        result = await test_service.process_teremok_test(user_id, answers, export=True)
+        test_id = result.id
         
-        # Get result type for response/notification (Need to recalculate or fetch, 
-        # but service returns ID. Let's optimize service later or re-calc here briefly for notification)
-        # Actually Service creates result, we can just peek answers or fetch result.
-        # For now, let's keep fast calc here for notification context
-        result_calc = calculate_result(answers)
-        result_type = result_calc['type']
+        logger.info(f"Test result saved for user {user_id}: {result.result_type} (ID: {test_id})")
         
-        logger.info(f"Test result saved for user {user_id}: {result_type} (ID: {test_id})")
-        
-        # Получаем контакты (если есть)
-        contact = await user_service.get_contact(user_id)
-        
-        # Отправляем уведомление менеджеру только если включено
+        # Уведомление менеджеру — в фоне, ответ уходит сразу после сохранения
         if settings.SEND_NOTIFICATIONS:
-            await notification_service.notify_test_result(
-                user_id=user_id,
-                contact=contact,
-                result_type=result_type,
-                answers=answers,
-                product="teremok",
-                scores=result_calc.get('scores', {})
+            task_queue.submit(
+                "notify_test_result", notify_test_result_task,
+                user_id, result.result_type, answers, "teremok", result.scores or {}
             )
-        
-        # Экспорт в Google Sheets
-        try:
-            # We add test_id just in case, though google sheets logic might not use it yet
-            from core.google_sheets import export_test_to_sheets
-            await export_test_to_sheets(
-                test={"user_id": user_id, "result_type": result_type, "scores": result_calc.get('scores', {}), "product": "teremok", "test_id": test_id},
-                lead=contact
-            )
-        except Exception as e:
-            logger.error(f"Failed to export test to sheets: {e}")
+        # The client opens the result page next: have it rendered by then
+        if settings.RESULT_PAGE_PRERENDER:
+            task_queue.submit("prerender_result", prerender_teremok_result, test_id, policy=NO_RETRY)
         
         return JSONResponse({
             "status": "success",
@@ -238,53 +307,118 @@ async def submit_test_results(request: Request):
             status_code=500
         )
 
+TEREMOK_TYPES_FOR_CHART = get_types_for_api()
+
+async def render_teremok_result(result_id: int) -> bytes | None:
+    """Result page HTML, None if there is no such result (templates do not use the request)"""
+    async with acquire() as conn:
+        row = await conn.fetchrow("SELECT * FROM test_results WHERE id = $1", result_id)
+    if not row:
+        return None
+        
+    result = dict(row)
+    
+    # Get detailed type info
+    type_info = TYPES_DATA.get(result['result_type'])
+    if not type_info:
+        # Fallback for unknown type
+        type_info = TYPES_DATA.get("bird") 
+        
+    # JSONB: decoded to a dict by the pool codec
+    scores = result['scores'] or {}
+    
+    html = templates.get_template("teremok/result.html").render({
+        "result": result,
+        "type_info": type_info,
+        "scores": scores,
+        "all_types": TEREMOK_TYPES_FOR_CHART
+    })
+    return html.encode("utf-8")
+
+async def prerender_teremok_result(result_id: int) -> None:
+    if ("teremok", result_id) not in result_pages:
+        body = await render_teremok_result(result_id)
+        if body is not None:
+            result_pages.put(("teremok", result_id), body)
+
 @router.get("/app/teremok/result/{result_id}", response_class=HTMLResponse)
 async def teremok_result_page(request: Request, result_id: int):
     """Страница результата теста"""
     try:
-        # Fetch result from DB
-        conn = await asyncpg.connect(settings.DATABASE_URL)
-        try:
-            row = await conn.fetchrow("SELECT * FROM test_results WHERE id = $1", result_id)
-        finally:
-            await conn.close()
-                
-        if not row:
-            return HTMLResponse("<h1>Результат не найден</h1>", status_code=404)
-            
-        result = dict(row)
-        
-        # Get detailed type info
-        type_info = TYPES_DATA.get(result['result_type'])
-        if not type_info:
-            # Fallback for unknown type
-            type_info = TYPES_DATA.get("bird") 
-            
-        # Parse scores if stored as string
-        scores = result['scores']
-        if isinstance(scores, str):
-            try:
-                import json
-                scores = json.loads(scores)
-            except:
-                scores = {}
-                
-        # Get types data for the chart
-        all_types = get_types_for_api()
-        
-        return templates.TemplateResponse("teremok/result.html", {
-            "request": request,
-            "result": result,
-            "type_info": type_info,
-            "scores": scores,
-            "all_types": all_types
-        })
+        key = ("teremok", result_id)
+        page = result_pages.get(key)
+        if page is None:
+            body = await render_teremok_result(result_id)
+            if body is None:
+                return HTMLResponse("<h1>Результат не найден</h1>", status_code=404)
+            page = result_pages.put(key, body)
+        return result_pages.response(request, page)
     except Exception as e:
         logger.error(f"Error loading result page: {e}")
         return HTMLResponse(f"<h1>Ошибка загрузки результата</h1><p>{str(e)}</p>", status_code=500)
         
 
 
+# Result ids are Postgres integer (int4)
+MAX_RESULT_ID = 2 ** 31 - 1
+
+def _parse_ids(raw: str | None) -> list:
+    """ "1,2,3" -> [1, 2, 3] (ValueError on garbage or ids outside 1..MAX_RESULT_ID) """
+    if not raw:
+        return []
+    ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    if any(not 1 <= i <= MAX_RESULT_ID for i in ids):
+        raise ValueError("id out of range")
+    return ids
+
+@router.get("/api/results")
+@limiter.limit("60/minute")
+async def get_results_batch(request: Request, ids: str = None, formula_ids: str = None):
+    """
+    Несколько результатов одним запросом (командные дашборды)
+    
+    Query params:
+        ids: id результатов «Теремка» через запятую (как в /app/teremok/result/{id})
+        formula_ids: id результатов «Формулы» (как в /app/formula/result/{id})
+    """
+    try:
+        teremok_ids, rsp_ids = _parse_ids(ids), _parse_ids(formula_ids)
+    except ValueError:
+        return JSONResponse({"status": "error", "message": "ids must be comma-separated positive integers"},
+                            status_code=400)
+    if not teremok_ids and not rsp_ids:
+        return JSONResponse({"status": "error", "message": "ids or formula_ids required"}, status_code=400)
+    if len(teremok_ids) + len(rsp_ids) > settings.RESULTS_BATCH_MAX:
+        return JSONResponse({"status": "error", "message": f"At most {settings.RESULTS_BATCH_MAX} ids"},
+                            status_code=400)
+
+    rows = await test_service.get_results_by_ids(teremok_ids, rsp_ids)
+    results = []
+    for row in rows:
+        if row['source'] == 'formula_rsp':
+            type_name = row['type_name'] or row['type_code']
+        else:
+            type_info = TYPES_DATA.get(row['type_code'])
+            type_name = type_info.name_ru if type_info else row['type_code']
+        results.append({
+            "id": row['id'],
+            "product": row['product'],
+            "type_code": row['type_code'],
+            "type_name": type_name,
+            "scores": as_json_value(row['scores']) or {},
+            "created_at": row['created_at'].isoformat() if row['created_at'] else None,
+        })
+
+    found_teremok = {r['id'] for r in rows if r['source'] == 'teremok'}
+    found_formula = {r['id'] for r in rows if r['source'] == 'formula_rsp'}
+    return JSONResponse({
+        "results": results,
+        "missing": {
+            "ids": [i for i in teremok_ids if i not in found_teremok],
+            "formula_ids": [i for i in rsp_ids if i not in found_formula],
+        }
+    })
+
 # Legacy endpoint (keep for backwards compatibility)
 @router.post("/api/submit-lead")
 async def submit_lead(request: Request):
@@ -304,7 +438,9 @@ async def submit_lead(request: Request):
         
         # Send to manager if bot is available (legacy behavior)
         if settings.SEND_NOTIFICATIONS:
-            await notification_service.notify_new_lead(
+            task_queue.submit(
+                "notify_new_lead", notification_service.notify_new_lead,
+                policy=NO_RETRY,
                 name=name,
                 contact=contact_info_str,
                 message=message,
@@ -315,7 +451,9 @@ async def submit_lead(request: Request):
         
         if result_type:
             # Also notify about test result if provided
-            await notification_service.notify_test_result(
+            task_queue.submit(
+                 "notify_test_result", notification_service.notify_test_result,
+                 policy=NO_RETRY,
                  result_type=result_type,
                  answers={}, # Not available in legacy lead
                  contact={"name": name, "phone": contact_info_str},
@@ -356,26 +494,16 @@ async def teremok_cases(request: Request):
 
 # API: Get questions
 @router.get("/api/formula/questions")
-async def get_formula_questions():
-    from core.formula_logic import FORMULA_QUESTIONS, FORMULA_OPTIONS
-    questions = [
-        {
-            "id": q.id,
-            "text": q.text,
-            "options": FORMULA_OPTIONS
-        }
-        for q in FORMULA_QUESTIONS
-    ]
-    return {"questions": questions, "total": len(questions)}
+async def get_formula_questions(request: Request):
+    return FORMULA_QUESTIONS_JSON.response(request)
 
 
 # ===== FORMULA (RSP) MODULE =====
 
 @app.get("/api/formula/rsp/questions")
-async def get_formula_rsp_questions():
+async def get_formula_rsp_questions(request: Request):
     """Get questions for Formula RSP test"""
-    from core.formula_rsp_questions import FORMULA_RSP_QUESTIONS
-    return JSONResponse({"questions": FORMULA_RSP_QUESTIONS})
+    return FORMULA_RSP_QUESTIONS_JSON.response(request)
 
 @app.post("/api/formula/rsp/submit")
 @limiter.limit("5/minute")
@@ -432,40 +560,19 @@ async def submit_formula_rsp_results(request: Request):
              await user_service.register_contact(contact)
 
         # Calculate and Save Result via Service
-        result_obj = await test_service.process_formula_rsp(user_id, answers)
+        result_obj = await test_service.process_formula_rsp(user_id, answers, export=True)
         test_id = result_obj.id
         
         logger.info(f"Formula RSP result saved for {user_id}: {result_obj.primary_code} (ID: {test_id})")
         
-        # Export to Google Sheets
-        contact = await user_service.get_contact(user_id)
-        try:
-            from core.google_sheets import export_test_to_sheets
-            await export_test_to_sheets(
-                test={
-                    "user_id": user_id, 
-                    "result_type": result_obj.primary_name,
-                    "scores": result_obj.scores,
-                    "product": "formula_rsp",
-                    "test_id": test_id,
-                    "name": name,
-                    "role": role 
-                },
-                lead=contact.__dict__ if contact else None
-            )
-        except Exception as e:
-            logger.error(f"Failed to export Formula RSP to sheets: {e}")
-
-        # Send notification
+        # Send notification (background)
         if settings.SEND_NOTIFICATIONS:
-            await notification_service.notify_test_result(
-                user_id=user_id,
-                contact=contact,
-                result_type=result_obj.primary_name,
-                answers=answers,
-                product="formula_rsp",
-                scores=result_obj.scores
+            task_queue.submit(
+                "notify_test_result", notify_test_result_task,
+                user_id, result_obj.primary_name, answers, "formula_rsp", result_obj.scores
             )
+        if settings.RESULT_PAGE_PRERENDER:
+            task_queue.submit("prerender_result", prerender_formula_result, test_id, policy=NO_RETRY)
 
         # Return result
         return JSONResponse({
@@ -521,47 +628,53 @@ async def formula_types_page(request: Request):
 async def formula_situations_page(request: Request):
     return templates.TemplateResponse("formula/situations.html", {"request": request})
 
+async def render_formula_result(test_id: int) -> bytes | None:
+    """Formula result page HTML, None if there is no such result"""
+    result = await test_service.get_formula_result(test_id)
+    if not result:
+        return None
+    
+    # Get detailed type info from RSP types
+    from core.formula_rsp_types import get_rsp_type, FORMULA_RSP_TYPES
+    
+    type_info = get_rsp_type(result.primary_type_code)
+    
+    if not type_info:
+        # Fallback
+        type_info = get_rsp_type("result")
+         
+    # JSONB comes back as a dict; rows written as JSON text before 0002 as str
+    scores = as_json_value(result.scores) or {}
+    if not isinstance(scores, dict):
+        scores = {}
+         
+    # All types for chart
+    all_types = list(FORMULA_RSP_TYPES.values())
+         
+    html = templates.get_template("formula/result.html").render({
+        "type_info": type_info,
+        "scores": scores,
+        "all_types": all_types
+    })
+    return html.encode("utf-8")
+
+async def prerender_formula_result(test_id: int) -> None:
+    if ("formula", test_id) not in result_pages:
+        body = await render_formula_result(test_id)
+        if body is not None:
+            result_pages.put(("formula", test_id), body)
+
 @app.get("/app/formula/result/{test_id}")
 async def formula_result_page(request: Request, test_id: int):
     try:
-        async with aiosqlite.connect(settings.DB_NAME) as db:
-            db.row_factory = aiosqlite.Row
-            # Use formula_rsp_results table
-            async with db.execute("SELECT * FROM formula_rsp_results WHERE id = ?", (test_id,)) as cursor:
-                row = await cursor.fetchone()
-        
-        if not row:
-            return HTMLResponse("<h1>Результат не найден</h1>", status_code=404)
-            
-        row_dict = dict(row)
-        
-        # Get detailed type info from RSP types
-        from core.formula_rsp_types import get_rsp_type, FORMULA_RSP_TYPES
-        
-        # primary_type_code field from DB
-        type_code = row_dict['primary_type_code']
-        type_info = get_rsp_type(type_code)
-        
-        if not type_info:
-            # Fallback
-            type_info = get_rsp_type("result")
-             
-        # Parse scores
-        import json
-        try:
-             scores = json.loads(row_dict['scores']) if isinstance(row_dict['scores'], str) else row_dict['scores']
-        except:
-             scores = {}
-             
-        # All types for chart
-        all_types = list(FORMULA_RSP_TYPES.values())
-             
-        return templates.TemplateResponse("formula/result.html", {
-            "request": request,
-            "type_info": type_info,
-            "scores": scores,
-            "all_types": all_types
-        })
+        key = ("formula", test_id)
+        page = result_pages.get(key)
+        if page is None:
+            body = await render_formula_result(test_id)
+            if body is None:
+                return HTMLResponse("<h1>Результат не найден</h1>", status_code=404)
+            page = result_pages.put(key, body)
+        return result_pages.response(request, page)
             
     except Exception as e:
         logger.error(f"Error loading Formula result page: {e}")
@@ -0,0 +1,92 @@
+"""
+Pre-serialized JSON for immutable API payloads (question and type catalogs).
+The body is encoded once, with gzip and (if the optional brotli package is
+installed) brotli variants, and served with a strong ETag per variant,
+Cache-Control and 304 on If-None-Match.
+"""
+import gzip
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from core.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Not worth compressing below this size
+MIN_COMPRESS_BYTES = 512
+
+
+def _accepted_codings(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding -> {coding: q}"""
+    codings = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+def _etag_list(header: Optional[str]) -> set:
+    return {tag.strip().removeprefix("W/") for tag in (header or "").split(",") if tag.strip()}
+
+
+class StaticJSON:
+
+    def __init__(self, payload, max_age: int = None):
+        body = json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = f"public, max-age={settings.CATALOG_CACHE_MAX_AGE if max_age is None else max_age}"
+        # encoding -> (etag, bytes); identity always present
+        self.variants: Dict[str, Tuple[str, bytes]] = {"identity": (f'"{digest}"', body)}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self._add("gzip", digest, gzip.compress(body, compresslevel=9, mtime=0))
+            if brotli is not None:
+                self._add("br", digest, brotli.compress(body, quality=11))
+        self.etags = {etag for etag, _ in self.variants.values()}
+
+    def _add(self, encoding: str, digest: str, data: bytes) -> None:
+        if len(data) < len(self.variants["identity"][1]):
+            self.variants[encoding] = (f'"{digest}-{encoding}"', data)
+
+    def _choose(self, accept_encoding: Optional[str]) -> str:
+        codings = _accepted_codings(accept_encoding)
+        wildcard = codings.get("*", 0.0)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and codings.get(encoding, wildcard) > 0:
+                return encoding
+        return "identity"
+
+    def response(self, request: Request) -> Response:
+        encoding = self._choose(request.headers.get("accept-encoding"))
+        etag, data = self.variants[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        # Same content whatever the encoding: any of our tags is a match
+        client_tags = _etag_list(request.headers.get("if-none-match"))
+        if "*" in client_tags or client_tags & self.etags:
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=data, media_type="application/json", headers=headers)